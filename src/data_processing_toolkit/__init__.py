@@ -4,4 +4,13 @@ Used to expose methods and classes to library level.
 """
 from data_processing_toolkit.collater import collate_excel_files
 from data_processing_toolkit.plot_info import PlotInfo, PlotType
-from plot_generator import generate_plots
+
+
+def __getattr__(name):
+    # plot_generator is only imported when generate_plots is first accessed,
+    # so importing the package doesn't pay for the plotting dependencies
+    if name == "generate_plots":
+        from data_processing_toolkit.plot_generator import generate_plots
+
+        return generate_plots
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -6,6 +6,7 @@
     combined excel file.
 """
 
+from multiprocessing import Pool, cpu_count
 from os.path import join
 from os import startfile
 from openpyxl import Workbook, load_workbook
@@ -14,12 +15,14 @@ import data_processing_toolkit.constants as constants
 from data_processing_toolkit.excel_formulas import (
     convert_to_excel_address,
     create_sheet_name,
-    get_cell_value,
     insert_openpyxl_chart,
+    parse_column_values,
 )
 from data_processing_toolkit.file_handler import (
+    create_folder_if_not_exists,
     get_excel_files_from_folder,
     get_filename,
+    load_cached,
 )
 
 def insert_point_analysis_chart(
@@ -67,8 +70,33 @@ def insert_point_analysis_chart(
     )
 
 
-def insert_point_analysis_formula(
-    pt_analysis_sheet,
+def write_buffered_cell(rows, row_no: int, col_no: int, value):
+    """
+    Function to write a value into a sheet that is buffered as a list of rows,
+    growing the buffer as needed. The buffered rows can later be appended to a
+    write-only worksheet.
+
+    Parameters
+    ----------
+    rows : list[list]
+        buffered rows of the worksheet
+    row_no : int
+        row number of cell
+    col_no : int
+        column number of cell
+    value : any
+        value to write to cell
+    """
+
+    while len(rows) <= row_no:
+        rows.append([])
+    row = rows[row_no]
+    if len(row) <= col_no:
+        row.extend([None] * (col_no + 1 - len(row)))
+    row[col_no] = value
+
+
+def get_point_analysis_formulas(
     sheet_index: int,
     sheet_title: str,
     file_index_: int,
@@ -76,13 +104,11 @@ def insert_point_analysis_formula(
     target_headers
 ):
     """
-    Function to insert point analysis sheet formulas for all target columns
+    Function to get the point analysis sheet formulas for all target columns
     in a given worksheet of a given file being combined.
 
     Parameters
     ----------
-    pt_analysis_sheet : xlsxwriter worksheet
-        point analysis worksheet in destination workbook
     sheet_index : int
         index of the copied worksheet in the destination workbook
     sheet_title : str
@@ -95,19 +121,134 @@ def insert_point_analysis_formula(
     target_headers : list[str]
         for each sheet in each excel file being combined, columns with header values
         in this list will be added to the combined excel file
+
+    Returns
+    -------
+    entries : list[tuple[int, int, str]]
+        (row number, column number, label or formula) of each cell to write
+        to the point analysis worksheet
     """
-    point_address = convert_to_excel_address(0, 1 + file_index_)
+
+    entries = []
+    # only the column varies between the formulas, so the part
+    # referencing the sheet is formatted once
+    formula_suffix = f',,,"{sheet_title}"))'
     for header_idx, target_header_ in enumerate(target_headers):
-        pt_analysis_sheet[
-            convert_to_excel_address(
-                sheet_index, +(space_between_targets * header_idx)
+        col_offset = space_between_targets * header_idx
+        point_col = 1 + file_index_ + col_offset
+        point_address = convert_to_excel_address(0, point_col)
+        entries.append((sheet_index, col_offset, f"{sheet_title} ({target_header_})"))
+        entries.append(
+            (
+                sheet_index,
+                point_col,
+                f"=INDIRECT(ADDRESS({point_address}+1, {point_col}" + formula_suffix,
             )
-        ] = f"{sheet_title} ({target_header_})"
-        pt_analysis_sheet[
-            convert_to_excel_address(sheet_index, 1 + file_index_)
-        ] = f'=INDIRECT(ADDRESS({point_address}+1, {file_index_ +(space_between_targets*header_idx)+ 1},,,"{sheet_title}"))'
+        )
+    return entries
+
 
-def collate_excel_files(root_folder, target_headers, independent_variable_sheetname=""):
+def extract_target_columns(file_path, target_headers):
+    """
+    Function to extract the content of target columns from each sheet
+    of an excel file.
+
+    Parameters
+    ----------
+    file_path : str
+        absolute path to the excel file
+    target_headers : list[str]
+        columns with header values in this list will be extracted
+
+    Returns
+    -------
+    target_columns : dict[str, dict[str, list]]
+        target_columns[sheetname][target header] = content of the target column,
+        excluding the header
+    """
+
+    target_headers_set = set(target_headers)  # used to lookup target headers in O(1) time
+    # load source workbook in read-only mode so the sheets are streamed
+    # rather than loaded into memory all at once. Only cell values are needed,
+    # so VBA and links to external workbooks are skipped. openpyxl streams the
+    # sheets with lxml (a dependency of this package) when it's installed, which
+    # frees each row's XML elements as they're read, and values_only=True below
+    # avoids creating Cell objects, so memory stays bounded by one row
+    src_workbook = load_workbook(
+        file_path, read_only=True, data_only=True, keep_vba=False, keep_links=False
+    )
+    target_columns = {}
+    for sheet in src_workbook.worksheets:
+        sheetname = sheet.title
+        sheet.reset_dimensions()  # some files misreport their dimensions
+
+        # stream the sheet once, using the header row to locate the
+        # target columns and buffering their contents
+        rows = sheet.iter_rows(values_only=True)
+        header_row = next(rows, ())
+        target_cols = []
+        headers_to_find = set(target_headers_set)
+        for col, header_cell_value in enumerate(header_row):
+            if header_cell_value in headers_to_find:
+                headers_to_find.remove(header_cell_value)
+                target_cols.append((col, header_cell_value))
+                if not headers_to_find:
+                    break  # the remaining columns can't be target columns
+        column_contents = [[] for _ in target_cols]
+        for row in rows:
+            n_values = len(row)
+            for (col, _), column_values in zip(target_cols, column_contents):
+                column_values.append(row[col] if col < n_values else None)
+        target_columns[sheetname] = {
+            header_cell_value: parse_column_values(
+                column_values,
+                is_number=True,
+                default_value=constants.ERROR_VALUE_FOR_INPUT,
+            )
+            for (_, header_cell_value), column_values in zip(
+                target_cols, column_contents
+            )
+        }
+
+    # read-only workbooks keep their file open until closed
+    src_workbook.close()
+    return target_columns
+
+
+def load_target_columns(file_path, target_headers, use_cache=True):
+    """
+    Function to load the content of target columns from each sheet of an
+    excel file, reusing the result of previous runs when the file is unchanged.
+
+    Parameters
+    ----------
+    file_path : str
+        absolute path to the excel file
+    target_headers : list[str]
+        columns with header values in this list will be extracted
+    use_cache : bool, optional
+        whether to read/write the extracted columns from/to a cache folder
+        next to the excel file, by default True
+
+    Returns
+    -------
+    target_columns : dict[str, dict[str, list]]
+        target_columns[sheetname][target header] = content of the target column,
+        excluding the header
+    """
+
+    if not use_cache:
+        return extract_target_columns(file_path, target_headers)
+    return load_cached(file_path, extract_target_columns, target_headers)
+
+
+def collate_excel_files(
+    root_folder,
+    target_headers,
+    independent_variable_sheetname="",
+    use_cache=True,
+    verbose=True,
+):
     """
     Function for combining excel files into a single excel file.
 
@@ -121,14 +262,25 @@ def collate_excel_files(root_folder, target_headers, independent_variable_sheetn
     independent_variable_sheetname : str, optional
         sheet name of data set which all other data sets will be plotted against. If not
         provided, no plots will be added in the combined excel file, by default ""
+    use_cache : bool, optional
+        whether to reuse the content extracted from excel files that haven't changed
+        since a previous run, by default True
+    verbose : bool, optional
+        whether to print the progress of the collation, by default True
 
     NOTE
-    When complete, the combined excel file will be automatically opened
+    When complete, the combined excel file will be automatically opened.
+    The excel files are read in parallel using multiprocessing, so on Windows
+    scripts calling this function must be guarded by `if __name__ == "__main__":`
     """
-    target_headers_set = set(target_headers)  # used to lookup target headers in O(1) time
+    # used to lookup the index of target headers in O(1) time
+    target_headers_idx = {
+        target_header: idx for idx, target_header in enumerate(target_headers)
+    }
     # source excel file
     if root_folder:
-        print(f"Folder selected: {root_folder}")
+        if verbose:
+            print(f"Folder selected: {root_folder}")
         # get excel files from the root_folder
         excel_file_paths = get_excel_files_from_folder(root_folder)
         excel_filenames = [get_filename(file_path) for file_path in excel_file_paths]
@@ -137,156 +289,165 @@ def collate_excel_files(root_folder, target_headers, independent_variable_sheetn
             n_files + 2
         )  # no. of columns placed between the columns of
         # target columns of a given source excel file in the combined excel file
+        # column where the block of each target header's file columns starts
+        header_col_offsets = [
+            rel_space_between_targets * idx for idx in range(len(target_headers))
+        ]
 
         if n_files:
-            dst_workbook = Workbook()
-            # create sheet for storing point analysis data which allows you view values
-            # of each files at a specific value of the independent variable
-            pt_analysis_sheet = dst_workbook.create_sheet(
-                create_sheet_name(constants.POINT_ANALYSIS_LABEL)
-            )
-            pt_analysis_sheet[convert_to_excel_address(0, 0)] = "Column Index ->"
+            # the combined workbook is written in write-only mode, so the content of
+            # each destination sheet is buffered as rows and appended once at the end
+            dst_workbook = Workbook(write_only=True)
+            # buffer for the sheet storing point analysis data which allows you view
+            # values of each files at a specific value of the independent variable
+            pt_analysis_rows = []
+            write_buffered_cell(pt_analysis_rows, 0, 0, "Column Index ->")
+            sheet_rows = {}  # buffered rows of each destination sheet
+            # row of each destination sheet in the point analysis sheet. Rows 0 and 1
+            # hold the column indexes and filenames respectively
+            dst_sheet_index = {}
             max_row_count = 0  # maximum number of rows across files
 
+            # each excel file is parsed independently, so their target columns
+            # are extracted in parallel
+            if verbose:
+                for excel_filename in excel_filenames:
+                    print(f"Reading excel file: {excel_filename}")
+            if use_cache:
+                # the cache folder is shared by all files, so it's created once here
+                # rather than by each of the worker processes
+                create_folder_if_not_exists(
+                    join(root_folder, constants.CACHE_FOLDERNAME)
+                )
+            with Pool(min(n_files, cpu_count())) as pool:
+                files_target_columns = pool.starmap(
+                    load_target_columns,
+                    [
+                        (file_path, target_headers, use_cache)
+                        for file_path in excel_file_paths
+                    ],
+                )
+
             for file_index in range(n_files):
-                # load source workbook
-                src_workbook = load_workbook(excel_file_paths[file_index], data_only=True)
-                sheetnames = src_workbook.sheetnames
                 excel_filename = excel_filenames[file_index]
-                print(f"Reading excel file: {excel_filename}")
+                target_columns = files_target_columns[file_index]
+                # labels of the file's target columns, shared by every sheet
+                file_labels = [
+                    f"{excel_filename} ({target_header})"
+                    for target_header in target_headers
+                ]
 
-                for idx, target_header in enumerate(target_headers):
+                for idx, file_label in enumerate(file_labels):
                     # add filename for each target header to the point analysis sheet
                     # to indicate the row where it's data will be displayed
-                    pt_analysis_sheet[
-                        convert_to_excel_address(1, 1 + (rel_space_between_targets * idx))
-                    ] = f"{excel_filename} ({target_header})"
-
-                for sheetname in sheetnames:
-                    # loop through each sheet to extract target columns and write
-                    # to the combined excel file
-                    sheet = src_workbook[sheetname]
-                    row_count = sheet.max_row
-                    col_count = sheet.max_colum
-                    max_row_count = max(row_count, max_row_count)
+                    write_buffered_cell(
+                        pt_analysis_rows,
+                        1,
+                        1 + file_index + header_col_offsets[idx],
+                        file_label,
+                    )
+
+                for sheetname, sheet_columns in target_columns.items():
+                    # loop through the target columns of each sheet and write
+                    # them to the combined excel file
                     contains_a_target_column = False
 
-                    for col in range(col_count):
-                        # check if column's header matches any of the target headers
-                        header_cell_value = sheet[convert_to_excel_address(0, col)].value
-                        if header_cell_value in target_headers_set:
-                            if sheetname in dst_workbook.sheetnames:
-                                dst_sheet = dst_workbook[sheetname]
-                            else:
-                                dst_sheet = dst_workbook.create_sheet(sheetname)
-                            sheet_index = dst_workbook.sheetnames.index(sheetname)
-                            if ~contains_a_target_column:
-                                # add formulas for this sheet into the point analysis sheet
-                                # if this hasn't been done before
-                                contains_a_target_column = True
-                                insert_point_analysis_formula(
-                                    pt_analysis_sheet,
-                                    sheet_index,
-                                    sheetname,
-                                    file_index,
-                                    rel_space_between_targets,
-                                    target_headers
-                                )
-
-                            # write filename as header in the destination worksheet
-                            header_index = target_headers.index(header_cell_value)
-                            dst_sheet[
-                                convert_to_excel_address(
-                                    0,
-                                    file_index + (rel_space_between_targets * header_index),
-                                )
-                            ] = f"{excel_filename} ({header_cell_value})"
-
-                            for row in range(1, row_count + 1):
-                                # transfer target column to destination worksheet
-                                print(
-                                    f"\tTransferring to destination worksheet: {header_cell_value}"
-                                )
-                                cell_content = get_cell_value(
-                                    sheet,
-                                    row,
-                                    col,
-                                    is_number=True,
-                                    default_value=constants.ERROR_VALUE_FOR_INPUT,
-                                )
-                                dst_sheet[
-                                    convert_to_excel_address(
-                                        row,
-                                        file_index
-                                        + (rel_space_between_targets * header_index),
-                                    )
-                                ] = cell_content
+                    for header_cell_value, column_values in sheet_columns.items():
+                        max_row_count = max(len(column_values) + 1, max_row_count)
+                        header_index = target_headers_idx[header_cell_value]
+                        if sheetname not in sheet_rows:
+                            sheet_rows[sheetname] = []
+                            dst_sheet_index[sheetname] = len(dst_sheet_index) + 2
+                        dst_rows = sheet_rows[sheetname]
+                        sheet_index = dst_sheet_index[sheetname]
+                        if not contains_a_target_column:
+                            # add formulas for this sheet into the point analysis sheet
+                            # if this hasn't been done before
+                            contains_a_target_column = True
+                            for row_no, col_no, value in get_point_analysis_formulas(
+                                sheet_index,
+                                sheetname,
+                                file_index,
+                                rel_space_between_targets,
+                                target_headers
+                            ):
+                                write_buffered_cell(pt_analysis_rows, row_no, col_no, value)
+
+                        # write filename as header in the destination worksheet
+                        dst_col = file_index + header_col_offsets[header_index]
+                        write_buffered_cell(dst_rows, 0, dst_col, file_labels[header_index])
 
-            # save combined excel workbook to root folder
-            destination_path = join(root_folder, f"-{constants.COLLATER_EXCEL_FILENAME}")
-            dst_workbook.save(destination_path)
-            dst_workbook = load_workbook(destination_path)
-            dst_workbook.active = dst_workbook.worksheets[1]
-            if constants.EXCEL_DEFAULT_SHEETNAME in dst_workbook.sheetnames:
-                # remove empty excel sheet that's usually added by default
-                dst_workbook.remove(dst_workbook.worksheets[0])
+                        # transfer target column to destination worksheet
+                        if verbose:
+                            print(
+                                f"\tTransferring to destination worksheet: {header_cell_value}"
+                            )
+                        for row, cell_content in enumerate(column_values, start=1):
+                            write_buffered_cell(dst_rows, row, dst_col, cell_content)
+
+            # append the buffered rows to the destination sheets
+            pt_analysis_sheet = dst_workbook.create_sheet(
+                create_sheet_name(constants.POINT_ANALYSIS_LABEL)
+            )
+            for row in pt_analysis_rows:
+                pt_analysis_sheet.append(row)
+            for sheetname, dst_rows in sheet_rows.items():
+                dst_sheet = dst_workbook.create_sheet(sheetname)
+                for row in dst_rows:
+                    dst_sheet.append(row)
 
             if independent_variable_sheetname:
                 # add plots to all sheets in the desitination workbook,
                 # plotting the data of each column against the
-                # dependent variable. Do this here, after saving the worksheet once, otherwise
-                # the plots will come up empty
-                pt_analysis_sheet = dst_workbook.create_sheet(
-                    create_sheet_name(constants.POINT_ANALYSIS_LABEL)
-                )
+                # dependent variable. Charts only reference the sheets by title,
+                # so they can be added to the write-only sheets before saving
                 x_sheet = dst_workbook[independent_variable_sheetname]
-                dst_sheetnames = dst_workbook.sheetnames
-                for sheetname in dst_sheetnames:
-                    if sheetname != constants.POINT_ANALYSIS_LABEL:
-                        for i, target_header in enumerate(target_headers):
-                            cols = [
-                                1
-                                for i in range(
-                                    (rel_space_between_targets * i),
-                                    n_files + (rel_space_between_targets * i),
-                                )
-                            ]
-                            min_rows = [1 for i in range(n_files)]
-                            max_rows = [max_row_count for i in range(n_files)]
-                            insert_openpyxl_chart(
-                                output_sheet=dst_workbook[sheetname],
-                                title=sheetname,
-                                x_title=independent_variable_sheetname,
-                                y_title=sheetname,
-                                x_sheet=x_sheet,
-                                x_cols=cols,
-                                x_min_rows=min_rows,
-                                x_max_rows=max_rows,
-                                y_sheet=dst_workbook[sheetname],
-                                y_cols=cols,
-                                y_min_rows=min_rows,
-                                y_max_rows=max_rows,
-                                labels=excel_filenames,
-                                location=convert_to_excel_address(
-                                    0, n_files + (rel_space_between_targets * i)
-                                ),
-                            )
-                    else:
-                        # insert dynamic plots into point analysis worksheet
-                        for sheet_index, sheetname in enumerate(dst_sheetnames):
-                            if sheetname != create_sheet_name(
-                                constants.POINT_ANALYSIS_LABEL
-                            ):
-                                insert_point_analysis_chart(
-                                    pt_analysis_sheet,
-                                    sheetname,
-                                    n_files,
-                                    sheet_index,
-                                    target_headers
-                                )
-
-            # save the file once more
-            dst_workbook.active = 0  # make sure the first worksheet is open
-            # when launching
+                # the point analysis sheet is the first sheet of the workbook
+                data_sheets = dst_workbook.worksheets[1:]
+                # the plots of each target header are placed at the same location
+                # in every sheet
+                chart_locations = [
+                    convert_to_excel_address(0, n_files + col_offset)
+                    for col_offset in header_col_offsets
+                ]
+                # so are the (1-based) columns of each file's data,
+                # which span the rows below the filename headers
+                chart_cols = [
+                    range(1 + col_offset, 1 + n_files + col_offset)
+                    for col_offset in header_col_offsets
+                ]
+                min_rows = [2] * n_files
+                max_rows = [max_row_count] * n_files
+                for dst_sheet in data_sheets:
+                    for i, cols in enumerate(chart_cols):
+                        insert_openpyxl_chart(
+                            output_sheet=dst_sheet,
+                            title=dst_sheet.title,
+                            x_title=independent_variable_sheetname,
+                            y_title=dst_sheet.title,
+                            x_sheet=x_sheet,
+                            x_cols=cols,
+                            x_min_rows=min_rows,
+                            x_max_rows=max_rows,
+                            y_sheet=dst_sheet,
+                            y_cols=cols,
+                            y_min_rows=min_rows,
+                            y_max_rows=max_rows,
+                            labels=excel_filenames,
+                            location=chart_locations[i],
+                        )
+
+                # insert dynamic plots into point analysis worksheet
+                for sheet_index, dst_sheet in enumerate(data_sheets, start=1):
+                    insert_point_analysis_chart(
+                        pt_analysis_sheet,
+                        dst_sheet.title,
+                        n_files,
+                        sheet_index,
+                        independent_variable_sheetname,
+                    )
+
+            # save combined excel workbook to root folder
+            destination_path = join(root_folder, f"-{constants.COLLATER_EXCEL_FILENAME}")
             dst_workbook.save(destination_path)
             startfile(destination_path)  # open combined excel file
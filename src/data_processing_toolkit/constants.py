@@ -20,7 +20,12 @@ EXCEL_FILE_EXTENSION = ".xlsx"
 DAVIS_SET_FILE_EXTENSION = ".set"
 PNG_FILE_EXTENSION = ".png"
 EPS_FILE_EXTENSION = ".eps"
+PICKLE_FILE_EXTENSION = ".pkl"
+JSON_FILE_EXTENSION = ".json"
 COLLATER_EXCEL_FILENAME = f"Cumulative{EXCEL_FILE_EXTENSION}"
+CACHE_FOLDERNAME = ".cache"
+CACHE_FORMAT_VERSION = 1  # changed whenever the content of cached results changes
+FIGURE_MANIFEST_FILENAME = f"figures{JSON_FILE_EXTENSION}"
 
 # Excel sheet names
 EXCEL_DEFAULT_SHEETNAME = "Sheet"
@@ -32,14 +37,16 @@ ERROR_FROM_EXCEL = "#VALUE!"
 REF_VALUE_FROM_EXCEL = "#REF!"
 DIV0_EXCEL_ERROR = "#DIV/0!"
 ERROR_VALUE_FOR_INPUT = "NA()"
-EXCEL_ERROR_VALUES = [
-    NAN_FROM_EXCEL,
-    ALT_NAN_FROM_EXCEL,
-    ERROR_FROM_EXCEL,
-    REF_VALUE_FROM_EXCEL,
-    ERROR_VALUE_FOR_INPUT,
-    DIV0_EXCEL_ERROR
-]
+EXCEL_ERROR_VALUES = frozenset(  # set for O(1) lookups of cell values
+    [
+        NAN_FROM_EXCEL,
+        ALT_NAN_FROM_EXCEL,
+        ERROR_FROM_EXCEL,
+        REF_VALUE_FROM_EXCEL,
+        ERROR_VALUE_FOR_INPUT,
+        DIV0_EXCEL_ERROR,
+    ]
+)
 
 # plotter.py constants
 HEADER_HEADER, X_HEADER, Y_HEADER = "header", "x", "y"
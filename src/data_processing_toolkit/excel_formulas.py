@@ -3,6 +3,7 @@
     excel formulas as well as plotting figures.
 """
 
+from functools import lru_cache
 from os.path import split
 import numpy as np
 from xlsxwriter.utility import xl_rowcol_to_cell, xl_cell_to_rowcol, xl_col_to_name
@@ -11,7 +12,26 @@ from openpyxl.chart.data_source import NumDataSource, NumRef
 from openpyxl.chart import ScatterChart, Reference, Series, marker
 import data_processing_toolkit.constants as constants
 
-
+_INF = float("inf")
+# translation table that deletes characters excel doesn't allow in sheet names
+_ILLEGAL_SHEET_NAME_CHARACTERS = str.maketrans("", "", "[]:*?/\\")
+# (slope, intercept) of the linear fits of the jet exit velocity and the flow
+# velocity at the depinning location against time, for each flow acceleration
+JET_VELOCITY_FIT_EQUATIONS = {
+    4.4: (4.7303408085, -1.6190716868),
+    3.2: (3.4542, -1.3055),
+    2.2: (2.3498, -1.0454),
+    1.2: (1.2631, -0.7672),
+}
+LOCAL_VELOCITY_FIT_EQUATIONS = {
+    4.4: (4.5387, -1.5401),
+    3.2: (3.2511, -1.2167),
+    2.2: (2.2221, -0.935),
+    1.2: (1.1916, -0.6331),
+}
+
+
+@lru_cache(maxsize=4096)  # there are only so many columns in a sheet
 def get_excel_column_range(col_no):
     """
     Function to convert a column number to an excel range formula
@@ -221,15 +241,8 @@ def calculate_jet_exit_velocity(image_time_address, flow_accel):
         appropriate excel formula
     """
 
-    jet_velocity_fit_equation = {
-        4.4: {"slope": 4.7303408085, "intercept": -1.6190716868},
-        3.2: {"slope": 3.4542, "intercept": -1.3055},
-        2.2: {"slope": 2.3498, "intercept": -1.0454},
-        1.2: {"slope": 1.2631, "intercept": -0.7672},
-    }
-    jet_velocity_fit_equation = jet_velocity_fit_equation[flow_accel]
-
-    return f'=({image_time_address} * {jet_velocity_fit_equation["slope"]}) + {jet_velocity_fit_equation["intercept"]}'
+    slope, intercept = JET_VELOCITY_FIT_EQUATIONS[flow_accel]
+    return f"=({image_time_address} * {slope}) + {intercept}"
 
 
 def calculate_local_flow_velocity(image_time_address, flow_accel):
@@ -250,14 +263,8 @@ def calculate_local_flow_velocity(image_time_address, flow_accel):
         appropriate excel formula
     """
 
-    local_velocity_fit_equations = {
-        4.4: {"slope": 4.5387, "intercept": -1.5401},
-        3.2: {"slope": 3.2511, "intercept": -1.2167},
-        2.2: {"slope": 2.2221, "intercept": -0.935},
-        1.2: {"slope": 1.1916, "intercept": -0.6331},
-    }
-    local_velocity_fit_equation = local_velocity_fit_equations[flow_accel]
-    return f'=({image_time_address} * {local_velocity_fit_equation["slope"]}) + {local_velocity_fit_equation["intercept"]}'
+    slope, intercept = LOCAL_VELOCITY_FIT_EQUATIONS[flow_accel]
+    return f"=({image_time_address} * {slope}) + {intercept}"
 
 
 def error_guard_formula(formula, default=None):
@@ -284,6 +291,7 @@ def error_guard_formula(formula, default=None):
         return f"=IFERROR({formula}, {default})"
 
 
+@lru_cache(maxsize=2048)  # the same cells are often addressed repeatedly
 def convert_to_excel_address(
     row_no, col_no, file_path="", sheet_name="", fixed_row=False, fixed_column=False
 ):
@@ -316,8 +324,7 @@ def convert_to_excel_address(
         row_no, col_no, row_abs=fixed_row, col_abs=fixed_column
     )
     if file_path:
-        root_path = split(file_path)[0]
-        file_name = split(file_path)[1]
+        root_path, file_name = split(file_path)
     return (
         f"'{root_path}\\[{file_name}]{sheet_name}'!{cell_address}"
         if file_path
@@ -327,6 +334,7 @@ def convert_to_excel_address(
     )
 
 
+@lru_cache(maxsize=4096)  # sheets of a workbook usually share their ranges
 def get_excel_row_range(start_row_no, end_row_no, col_no, sheet_name=""):
     """
     Function to generate generate excel row range
@@ -380,9 +388,9 @@ def convert_from_excel_cell_address(cell_address):
         col number of cell
     """
 
-    if "!" in cell_address:
-        sheet_name = cell_address.split("!")[0].strip("'")
-        address = cell_address.split("!")[1]
+    sheet_part, separator, address = cell_address.partition("!")
+    if separator:
+        sheet_name = sheet_part.strip("'")
     else:
         sheet_name = ""
         address = cell_address
@@ -404,7 +412,9 @@ def is_bad_input(value):
     bool
         whether it is a common error value
     """
-    return (value is None) or (np.isnan(value)) or (np.isinf(value))
+    # value != value is only true for NaN. Comparing plain floats avoids the
+    # overhead of calling numpy ufuncs on scalars
+    return (value is None) or (value != value) or (abs(value) == _INF)
 
 
 def write_cell(worksheet, row_no, col_no, data):
@@ -423,17 +433,21 @@ def write_cell(worksheet, row_no, col_no, data):
         value to write to cell
     """
 
-    try:
-        if str(data).startswith("="):
+    # only strings can be formulas, and numbers are written with the typed
+    # writer rather than xlsxwriter's generic write, which checks the type again
+    if isinstance(data, str):
+        if data.startswith("="):
             worksheet.write_formula(row_no, col_no, data)
         else:
-            if (
-                isinstance(data, np.float64) or isinstance(data, float)
-            ) and is_bad_input(data):
-                worksheet.write_formula(row_no, col_no, "")
-            else:
-                worksheet.write(row_no, col_no, data)
-    except Exception:
+            worksheet.write(row_no, col_no, data)
+    elif isinstance(data, float):  # also matches np.float64
+        if is_bad_input(data):
+            worksheet.write_formula(row_no, col_no, "")
+        else:
+            worksheet.write_number(row_no, col_no, data)
+    elif isinstance(data, (int, np.integer)) and not isinstance(data, bool):
+        worksheet.write_number(row_no, col_no, data)
+    else:
         worksheet.write(row_no, col_no, data)
 
 
@@ -461,6 +475,38 @@ def get_cell_value(worksheet, row_no, col_no, is_number=True, default_value=None
     """
 
     cell_data = worksheet[convert_to_excel_address(row_no, col_no)].value
+    return parse_cell_value(
+        cell_data, is_number=is_number, default_value=default_value
+    )
+
+
+def parse_cell_value(cell_data, is_number=True, default_value=None):
+    """
+    Function to convert a raw value read from an excel cell
+    (e.g. using iter_rows(values_only=True)) to a usable value
+
+    Parameters
+    ----------
+    cell_data : any
+        raw content of cell
+    is_number : bool, optional
+        whether the cell is expected to contain a number, by default True
+    default_value : any, optional
+        value to default to if there's an error, by default None
+
+    Returns
+    -------
+    any
+        content of cell
+    """
+
+    # numbers can't be excel error values and empty cells can't be numbers,
+    # so neither needs the error value lookup or the exception handling below
+    if isinstance(cell_data, (int, float)):
+        return float(cell_data) if is_number else str(cell_data)
+    if is_number and cell_data is None:
+        return default_value
+
     try:
         if is_number:
             return (
@@ -478,6 +524,87 @@ def get_cell_value(worksheet, row_no, col_no, is_number=True, default_value=None
         return default_value
 
 
+def parse_column_values(column_values, is_number=True, default_value=None):
+    """
+    Function to convert the raw values read from an excel column
+    (e.g. using iter_rows(values_only=True)) to usable values
+
+    Parameters
+    ----------
+    column_values : list
+        raw content of the column's cells
+    is_number : bool, optional
+        whether the cells are expected to contain numbers, by default True
+    default_value : any, optional
+        value to default to if there's an error, by default None
+
+    Returns
+    -------
+    list
+        content of the column's cells
+    """
+
+    if is_number:
+        # columns containing only numbers, empty cells and excel error values are
+        # converted using vectorized numpy calls, which is much faster than
+        # converting each cell
+        values = np.empty(len(column_values), dtype=object)
+        values[:] = column_values
+        is_error = np.isin(values, np.array(list(constants.EXCEL_ERROR_VALUES), dtype=object))
+        try:
+            numbers = np.array(values[~is_error], dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+        else:
+            numbers_values = numbers.astype(object)
+            numbers_values[np.isnan(numbers)] = default_value
+            values[~is_error] = numbers_values
+            values[is_error] = default_value
+            return values.tolist()
+    return [
+        parse_cell_value(cell_data, is_number=is_number, default_value=default_value)
+        for cell_data in column_values
+    ]
+
+
+def group_plain_values(contents):
+    """
+    Function to split values being written to consecutive cells into runs of
+    plain values, which xlsxwriter can write in a single call, and values that
+    need to be written by write_cell (i.e. formulas and bad inputs)
+
+    Parameters
+    ----------
+    contents : iterable
+        values to be written
+
+    Yields
+    ------
+    offset : int
+        index of the first value of the group in contents
+    values : list
+        values in the group
+    is_plain : bool
+        whether the group is a run of plain values
+    """
+
+    run_offset, run = 0, []
+    for offset, data in enumerate(contents):
+        if (isinstance(data, str) and data.startswith("=")) or (
+            isinstance(data, float) and is_bad_input(data)
+        ):
+            if run:
+                yield run_offset, run, True
+                run = []
+            yield offset, [data], False
+        else:
+            if not run:
+                run_offset = offset
+            run.append(data)
+    if run:
+        yield run_offset, run, True
+
+
 def write_row(worksheet, contents, row_no, start_col=0):
     """
     Function to write data into an excel row
@@ -494,8 +621,11 @@ def write_row(worksheet, contents, row_no, start_col=0):
         column number of leftmost cell in the row, by default 0
     """
 
-    for col_no, data in enumerate(contents):
-        write_cell(worksheet, row_no, start_col + col_no, data)
+    for offset, values, is_plain in group_plain_values(contents):
+        if is_plain:
+            worksheet.write_row(row_no, start_col + offset, values)
+        else:
+            write_cell(worksheet, row_no, start_col + offset, values[0])
 
 
 def write_col(worksheet, contents, col_no, start_row=0):
@@ -514,8 +644,11 @@ def write_col(worksheet, contents, col_no, start_row=0):
         row number of topmost cell in the start_row, by default 0
     """
 
-    for row_no, data in enumerate(contents):
-        write_cell(worksheet, start_row + row_no, col_no, data)
+    for offset, values, is_plain in group_plain_values(contents):
+        if is_plain:
+            worksheet.write_column(start_row + offset, col_no, values)
+        else:
+            write_cell(worksheet, start_row + offset, col_no, values[0])
 
 
 def write_openpyxl_row(worsksheet, row_no, col_no, contents):
@@ -534,12 +667,36 @@ def write_openpyxl_row(worsksheet, row_no, col_no, contents):
         values to write to row
     """
 
-    for idx, value in enumerate(contents):
-        worsksheet[convert_to_excel_address(row_no=row_no, col_no=col_no + idx)] = (
-            value if value is not None else ""
+    # openpyxl rows and columns are 1-based. Writing to them directly avoids
+    # building an excel address which openpyxl would then parse back
+    for column, value in enumerate(contents, start=col_no + 1):
+        worsksheet.cell(
+            row=row_no + 1, column=column, value=value if value is not None else ""
         )
 
 
+def write_openpyxl_rows(worksheet, rows):
+    """
+    Function to append rows of data to an excel sheet
+
+    Parameters
+    ----------
+    worksheet : openpyxl worksheet
+        sheet the rows are appended to
+    rows : iterable[iterable]
+        values to write to each row
+
+    Notes
+    -----
+    worksheet should belong to a workbook created with Workbook(write_only=True),
+    so the rows are streamed to the file rather than kept in memory.
+    Rows are appended below the last row of the sheet, starting in the first column
+    """
+
+    for row in rows:
+        worksheet.append([value if value is not None else "" for value in row])
+
+
 def create_sheet_name(name):
     """
     Function to edit a proposed sheetname to ensure its valid in excel
@@ -558,8 +715,8 @@ def create_sheet_name(name):
     sheet_name = (
         name if len(name) <= 31 else name[:31]
     )  # excel sheet titles have a max lenght of 31 chars
-    sheet_name = "".join(
-        c for c in sheet_name if not c in "[]:*?/\\"
+    sheet_name = sheet_name.translate(
+        _ILLEGAL_SHEET_NAME_CHARACTERS
     )  # remove illegal characters from shet name
     return sheet_name
 
@@ -584,39 +741,25 @@ def add_sheet_statistics(stats_sheet, source_sheet_name, headers, n_rows):
         calculated
     """
 
-    column_ranges = list(
-        map(
-            lambda x: f"'{source_sheet_name}'!{get_excel_row_range(1, n_rows, headers.index(x)).lstrip('=')}",
-            headers,
-        )
-    )
+    # the range of each column is built once, and the index of each header
+    # is its position in headers rather than a headers.index() lookup
+    column_ranges = [
+        f"'{source_sheet_name}'!{get_excel_row_range(1, n_rows, col_no).lstrip('=')}"
+        for col_no in range(len(headers))
+    ]
     write_row(stats_sheet, [constants.STAT_LABEL] + headers, 0)
     formulas = {
-        constants.AVERAGE_LABEL: (
-            lambda x: f"=AVERAGE({column_ranges[headers.index(x)]})"
-        ),
-        constants.STD_LABEL: (lambda x: f"=STDEV({column_ranges[headers.index(x)]})"),
-        constants.MODE_LABEL: (lambda x: f"=MODE({column_ranges[headers.index(x)]})"),
-        constants.MEDIAN_LABEL: (
-            lambda x: f"=MEDIAN({column_ranges[headers.index(x)]})"
-        ),
-        constants.PERCENTILE_25_LABEL: (
-            lambda x: f"=PERCENTILE({column_ranges[headers.index(x)]}, 0.25)"
-        ),
-        constants.PERCENTILE_75_LABEL: (
-            lambda x: f"=PERCENTILE({column_ranges[headers.index(x)]}, 0.75)"
-        ),
+        constants.AVERAGE_LABEL: (lambda x: f"=AVERAGE({x})"),
+        constants.STD_LABEL: (lambda x: f"=STDEV({x})"),
+        constants.MODE_LABEL: (lambda x: f"=MODE({x})"),
+        constants.MEDIAN_LABEL: (lambda x: f"=MEDIAN({x})"),
+        constants.PERCENTILE_25_LABEL: (lambda x: f"=PERCENTILE({x}, 0.25)"),
+        constants.PERCENTILE_75_LABEL: (lambda x: f"=PERCENTILE({x}, 0.75)"),
     }
     for i, (stat, eq) in enumerate(formulas.items()):
         write_row(
             stats_sheet,
-            [stat]
-            + list(
-                map(
-                    eq,
-                    headers,
-                )
-            ),
+            [stat] + [eq(column_range) for column_range in column_ranges],
             i + 1,
         )
 
@@ -660,9 +803,11 @@ def insert_chart(
 
     chart = workbook.add_chart({"type": "scatter", "subtype": "straight"})
     if not series_names:
-        series_names = [str(i).zfill(5) for i in range(len(y_sets))]
+        series_names = [f"{i:05d}" for i in range(len(y_sets))]
+    sheet_name = sheet.get_name()
     for i, series_name in enumerate(series_names):
-        if series_name in error_bars.keys():
+        if series_name in error_bars:
+            series_error_bars = error_bars[series_name]
             chart.add_series(
                 {
                     "name": series_name,
@@ -670,8 +815,8 @@ def insert_chart(
                     "values": y_sets[i],
                     "y_error_bars": {
                         "type": "custom",
-                        "plus_values": error_bars[series_name],
-                        "minus_values": error_bars[series_name],
+                        "plus_values": series_error_bars,
+                        "minus_values": series_error_bars,
                     },
                 }
             )
@@ -679,7 +824,7 @@ def insert_chart(
             chart.add_series(
                 {
                     "name": convert_to_excel_address(
-                        row_no=0, col_no=i, sheet_name=sheet.get_name()
+                        row_no=0, col_no=i, sheet_name=sheet_name
                     ),
                     "categories": x_sets[i],
                     "values": y_sets[i],
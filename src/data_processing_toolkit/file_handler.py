@@ -4,12 +4,41 @@
 """
 
 import os
+import atexit
+import hashlib
+import pickle
+import re
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import Tk, filedialog
-from os import listdir, makedirs
-from os.path import join, split, exists, isdir
+from os import makedirs
+from os.path import join, split
 import cv2
 import data_processing_toolkit.constants as constants
 
+_tk_root = None  # hidden tkinter window shared by all file dialogs
+
+
+def _get_tk_root():
+    """
+    Function to get the hidden tkinter window used as the parent of file dialogs,
+    creating it the first time a dialog is opened
+
+    Returns
+    -------
+    Tk
+        hidden tkinter root window
+    """
+
+    global _tk_root
+    if _tk_root is None:
+        _tk_root = Tk()  # Pointing root to Tk() to use it as Tk() in program.
+        _tk_root.withdraw()  # Hides small tkinter window.
+        _tk_root.attributes("-topmost", True)  # Opened window will be active and
+        # above all windows despite of selection.
+        atexit.register(_tk_root.destroy)
+    _tk_root.update()  # process pending events so the dialog opens on top
+    return _tk_root
+
 
 def get_folder():
     """
@@ -21,12 +50,9 @@ def get_folder():
         absolute path to selected folder
     """
 
-    root = Tk()  # Pointing root to Tk() to use it as Tk() in program.
-    root.withdraw()  # Hides small tkinter window.
-    root.attributes("-topmost", True)  # Opened window will be active and above all
-    # windows despite of selection.
-    folder = filedialog.askdirectory()  # Open file dialog that returns selected
-    # absolute paths as stringsr
+    folder = filedialog.askdirectory(
+        parent=_get_tk_root()
+    )  # Open file dialog that returns selected absolute paths as stringsr
     return folder
 
 
@@ -40,12 +66,9 @@ def get_file():
         absolute file path to selected file
     """
 
-    root = Tk()  # Pointing root to Tk() to use it as Tk() in program.
-    root.withdraw()  # Hides small tkinter window.
-    root.attributes("-topmost", True)  # Opened window will be active and above all
-    # windows despite of selection.
-    filename = filedialog.askopenfilename()  # Open file dialog that returns selected
-    # absolute paths as stringsr
+    filename = filedialog.askopenfilename(
+        parent=_get_tk_root()
+    )  # Open file dialog that returns selected absolute paths as stringsr
     return filename
 
 
@@ -59,12 +82,9 @@ def get_files():
         absolute file paths to selected files
     """
 
-    root = Tk()  # Pointing root to Tk() to use it as Tk() in program.
-    root.withdraw()  # Hides small tkinter window.
-    root.attributes("-topmost", True)  # Opened window will be active
-    # and above all windows despite of selection.
-    filenames = filedialog.askopenfilenames()  # Open file dialog that
-    # returns selected absolute paths as stringsr
+    filenames = filedialog.askopenfilenames(
+        parent=_get_tk_root()
+    )  # Open file dialog that returns selected absolute paths as stringsr
     return filenames
 
 
@@ -123,14 +143,18 @@ def get_files_from_folder(folder_path, only_files_with_extension=""):
     Returns
     -------
     file_paths : iterable[str]
-        absolute file paths
+        absolute file paths, sorted by name
     """
 
-    return [
-        join(folder_path, file)
-        for file in listdir(folder_path)
-        if file.endswith(only_files_with_extension)
-    ]
+    # scandir entries cache their file type, so no extra stat call is made per entry
+    with os.scandir(folder_path) as entries:
+        if not only_files_with_extension:
+            return sorted(entry.path for entry in entries if entry.is_file())
+        return sorted(
+            entry.path
+            for entry in entries
+            if entry.is_file() and entry.name.endswith(only_files_with_extension)
+        )
 
 
 def get_subfolders(folder_path):
@@ -145,14 +169,11 @@ def get_subfolders(folder_path):
     Returns
     -------
     subfolder_paths : iterable[str]
-        absolute folder paths to subfolders
+        absolute folder paths to subfolders, sorted by name
     """
 
-    return [
-        join(folder_path, folder)
-        for folder in listdir(folder_path)
-        if isdir(join(folder_path, folder))
-    ]
+    with os.scandir(folder_path) as entries:
+        return sorted(entry.path for entry in entries if entry.is_dir())
 
 
 def get_filename(file_path):
@@ -194,6 +215,162 @@ def get_path_to_file(file_path):
     return split(file_path)[0]
 
 
+def get_file_hash(file_path, *extra_keys):
+    """
+    Function to compute a hash of a file's content, which can be used to
+    detect whether the file has changed
+
+    Parameters
+    ----------
+    file_path : str
+        absolute path to file
+    *extra_keys : any
+        additional values (e.g. processing options) whose string
+        representation will be included in the hash
+
+    Returns
+    -------
+    file_hash : str
+        hexadecimal sha1 digest of the file's content
+    """
+
+    file_hash = hashlib.sha1()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            file_hash.update(chunk)
+    for extra_key in extra_keys:
+        file_hash.update(repr(extra_key).encode())
+    return file_hash.hexdigest()
+
+
+def get_cache_path(file_path, cache_name, file_hash):
+    """
+    Function to get the path of a file's cache in the cache folder next to the file
+
+    Parameters
+    ----------
+    file_path : str
+        absolute path to file
+    cache_name : str
+        name of the kind of content cached (e.g. the function it's extracted by)
+    file_hash : str
+        hash of the file's content (see get_file_hash)
+
+    Returns
+    -------
+    cache_path : str
+        absolute path to the cache file
+    """
+
+    return join(
+        get_path_to_file(file_path),
+        constants.CACHE_FOLDERNAME,
+        f"{get_filename(file_path)}-{cache_name}-{file_hash}"
+        f"{constants.PICKLE_FILE_EXTENSION}",
+    )
+
+
+def read_cache(cache_path):
+    """
+    Function to read the content of a cache file
+
+    Parameters
+    ----------
+    cache_path : str
+        absolute path to the cache file (see get_cache_path)
+
+    Returns
+    -------
+    any
+        content of the cache file, or None if the file is missing or unreadable
+    """
+
+    try:
+        with open(cache_path, "rb") as cache_file:
+            return pickle.load(cache_file)
+    except Exception:
+        # truncated or incompatible pickles can raise almost any error, and the
+        # content can always be extracted again
+        return None
+
+
+def write_cache(cache_path, content):
+    """
+    Function to write content to a cache file, deleting the caches of
+    previous versions of the same file
+
+    Parameters
+    ----------
+    cache_path : str
+        absolute path to the cache file (see get_cache_path)
+    content : any
+        picklable content to be cached
+    """
+
+    # the cache is written to a temporary file which then replaces the cache file,
+    # so an interrupted write can't leave a partial cache file
+    cache_folder, cache_filename = split(cache_path)
+    create_folder_if_not_exists(cache_folder)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as cache_file:
+        pickle.dump(content, cache_file)
+    os.replace(temp_path, cache_path)
+
+    # caches of the same kind of content with a different file hash are from
+    # earlier versions of the file, so they'll never be read again
+    cache_prefix = cache_filename[: cache_filename.rindex("-") + 1]
+    outdated_cache_pattern = re.compile(
+        re.escape(cache_prefix)
+        + r"[0-9a-f]{40}"
+        + re.escape(constants.PICKLE_FILE_EXTENSION)
+    )
+    with os.scandir(cache_folder) as entries:
+        outdated_cache_paths = [
+            entry.path
+            for entry in entries
+            if entry.name != cache_filename
+            and outdated_cache_pattern.fullmatch(entry.name)
+        ]
+    for outdated_cache_path in outdated_cache_paths:
+        try:
+            os.remove(outdated_cache_path)
+        except FileNotFoundError:
+            pass  # already deleted by another process
+
+
+def load_cached(file_path, extract, *args):
+    """
+    Function to extract content from a file, reusing the result of previous runs
+    stored in a cache folder next to the file when the file is unchanged
+
+    Parameters
+    ----------
+    file_path : str
+        absolute path to file
+    extract : callable
+        function that extracts the content, called as extract(file_path, *args).
+        Its result must be picklable
+    *args : any
+        additional arguments of extract, whose string representation is included
+        in the cache key
+
+    Returns
+    -------
+    any
+        content extracted from the file
+    """
+
+    # cached results are keyed by the content of the file, the extraction
+    # arguments, and the version of the cache format
+    file_hash = get_file_hash(file_path, list(args), constants.CACHE_FORMAT_VERSION)
+    cache_path = get_cache_path(file_path, extract.__name__, file_hash)
+    content = read_cache(cache_path)
+    if content is None:
+        content = extract(file_path, *args)
+        write_cache(cache_path, content)
+    return content
+
+
 def create_folder_if_not_exists(folder_path):
     """
     Function to create a folder, and all intermediate directories,
@@ -210,8 +387,8 @@ def create_folder_if_not_exists(folder_path):
         absolute folder path
     """
 
-    if not exists(folder_path):
-        makedirs(folder_path)
+    # exist_ok avoids a race when parallel workers create the same folder
+    makedirs(folder_path, exist_ok=True)
     return folder_path
 
 
@@ -250,21 +427,32 @@ def generate_video_from_images(
     image_paths = get_files_from_folder(folder_path)
     if image_paths:
         if figsize is None:
-            image = cv2.imread(os.path.join(folder_path, image_paths[0]))
+            image = cv2.imread(os.path.join(folder_path, image_paths[0]), cv2.IMREAD_COLOR)
             figsize = (image.shape[1], image.shape[0])
+        figsize = tuple(figsize)
+
+        def read_image(image_path):
+            # decode an image, only resizing it if it doesn't match the video frame
+            image = cv2.imread(os.path.join(folder_path, image_path), cv2.IMREAD_COLOR)
+            if image is not None and (image.shape[1], image.shape[0]) != figsize:
+                image = cv2.resize(image, figsize)
+            return image
 
         # set video parameters
         fc = cv2.VideoWriter_fourcc(*"mp4v")
         video = cv2.VideoWriter(video_name, fc, fps, figsize)
 
-        # combine the images into the video
-        for image_path in image_paths:
-            try:
-                image = cv2.imread(os.path.join(folder_path, image_path))
-                image = cv2.resize(image, figsize)
-                video.write(image)
-                if delete_pictures_when_done:
-                    os.remove(os.path.join(folder_path, image_path))
-            except:
-                pass
+        # combine the images into the video. cv2 releases the GIL while decoding,
+        # so batches of images are decoded in parallel threads, while the frames
+        # are written in order by this thread since VideoWriter isn't thread-safe
+        n_workers = min(32, (os.cpu_count() or 1) + 4)
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            for batch_start in range(0, len(image_paths), n_workers):
+                batch = image_paths[batch_start : batch_start + n_workers]
+                for image_path, image in zip(batch, executor.map(read_image, batch)):
+                    if image is None:
+                        continue  # skip files that aren't images
+                    video.write(image)
+                    if delete_pictures_when_done:
+                        os.remove(os.path.join(folder_path, image_path))
         video.release()
@@ -37,28 +37,60 @@ def least_square_fit(x, y, fit_function, init_guess):
         R-squared value of generated fit
     '''
 
-    def apply_fit(consts, ind):
-        if fit_function == FitType.EXPONENT:
-            return consts[0] + (consts[1] * np.exp(consts[2] * ind))
-        elif fit_function == FitType.POWER:
-            return consts[0] + (consts[1] * np.POWER(ind, consts[2]))
-        elif fit_function == FitType.LOG:
+    # the fit function is chosen once, rather than each time
+    # the solver evaluates the residue. The exponent and power fits are
+    # computed in place in a single new array per evaluation (the array can't
+    # be reused between evaluations since the solver keeps previous residues)
+    if fit_function == FitType.EXPONENT:
+        def apply_fit(consts, ind):
+            fit = np.multiply(ind, consts[2], dtype=float)
+            np.exp(fit, out=fit)
+            fit *= consts[1]
+            fit += consts[0]
+            return fit
+    elif fit_function == FitType.POWER:
+        def apply_fit(consts, ind):
+            fit = np.power(ind, consts[2], dtype=float)
+            fit *= consts[1]
+            fit += consts[0]
+            return fit
+    elif fit_function == FitType.LOG:
+        def apply_fit(consts, ind):
             return consts[0] + (consts[1] * np.log10(ind))
-        elif fit_function == FitType.LN:
-            return consts[0] + (consts[1] * np.LOG(ind))
-        else:
+    elif fit_function == FitType.LN:
+        def apply_fit(consts, ind):
+            return consts[0] + (consts[1] * np.log(ind))
+    else:
+        def apply_fit(consts, ind):
             return ind
 
     def residue(consts):
         return apply_fit(consts, x) - y
 
     # generate least-square fit solution coefficients
-    solution = least_squares(residue, init_guess)
-    coeffs = solution.x
+    if fit_function in (FitType.LOG, FitType.LN):
+        # log fits are linear in their coefficients, so the least-square solution
+        # is solved for directly rather than iteratively. Any extra coefficients
+        # in the initial guess are unused by the fit, so they are left unchanged
+        log_x = np.log10(x) if fit_function == FitType.LOG else np.log(x)
+        design_matrix = np.column_stack([np.ones_like(log_x), log_x])
+        coeffs = np.array(init_guess, dtype=float)
+        coeffs[:2] = np.linalg.lstsq(design_matrix, y, rcond=None)[0]
+        residues = residue(coeffs)
+    else:
+        solution = least_squares(residue, init_guess)
+        coeffs = solution.x
+        residues = solution.fun  # the solver returns the residues at the solution
 
-    # calculate least-square R-squared value
-    corr_matrix = np.corrcoef(y, apply_fit(coeffs, x))
-    corr = corr_matrix[0,1]
-    r_sq = corr**2
+    # calculate least-square R-squared value (i.e. the squared correlation of the
+    # data and the fit)
+    y_values = np.asarray(y, dtype=float)
+    y_dev = y_values - y_values.mean()
+    fit_values = y_values + residues
+    fit_dev = fit_values - fit_values.mean()
+    r_sq = np.dot(y_dev, fit_dev) ** 2 / (
+        np.dot(y_dev, y_dev) * np.dot(fit_dev, fit_dev)
+    )
+    r_sq = np.minimum(r_sq, 1.0)  # rounding errors can push perfect fits above 1
 
     return coeffs, r_sq
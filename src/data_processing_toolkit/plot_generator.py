@@ -8,22 +8,67 @@
     modified for the users specific use case.
 """
 
-from os.path import join
+import hashlib
+import json
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from itertools import zip_longest
+from multiprocessing import cpu_count
+from os import getpid, replace
+from os.path import exists, getmtime, join
 from openpyxl import load_workbook
-from matplotlib import pyplot as plt
 import numpy as np
 import data_processing_toolkit.constants as constants
 from data_processing_toolkit.plot_info import PlotType
-from data_processing_toolkit.excel_formulas import (
-    convert_to_excel_address,
-    get_cell_value,
-)
+from data_processing_toolkit.excel_formulas import parse_column_values
 from data_processing_toolkit.file_handler import (
     get_file,
+    get_file_hash,
     get_path_to_file,
     create_folder_if_not_exists,
+    get_cache_path,
+    read_cache,
+    write_cache,
 )
 
+# no. of points at which fit lines are evaluated
+FIT_LINE_SAMPLE_COUNT = 200
+
+# no. of points above which scatter plots are rasterized
+RASTERIZE_POINT_COUNT = 5000
+
+# headers of the target columns of each sheet, in the order they're read
+TARGET_HEADERS = (
+    constants.HEADER_HEADER,
+    constants.X_HEADER,
+    constants.Y_HEADER,
+    constants.Y_POS_ERROR_HEADER,
+    constants.Y_NEG_ERROR_HEADER,
+    constants.X_POS_ERROR_HEADER,
+    constants.X_NEG_ERROR_HEADER,
+)
+# headers of the target columns that hold numeric plot data
+DATA_HEADERS = TARGET_HEADERS[1:]
+# prefixes of the names of secondary series
+SECONDARY_SERIES_PREFIXES = (
+    constants.SECONDARY_SERIES_PREFIX,
+    constants.SECONDARY_2_SERIES_PREFIX,
+    constants.SECONDARY_3_SERIES_PREFIX,
+)
+# headers of columns that hold both the +ve and -ve errors of a variable. These
+# take precedence over columns with the separate +ve and -ve error headers
+COMBINED_ERROR_HEADERS = {
+    constants.Y_ERROR_HEADER: (
+        constants.Y_POS_ERROR_HEADER,
+        constants.Y_NEG_ERROR_HEADER,
+    ),
+    constants.X_ERROR_HEADER: (
+        constants.X_POS_ERROR_HEADER,
+        constants.X_NEG_ERROR_HEADER,
+    ),
+}
+
 
 def generate_plots(
     plot_infos,
@@ -51,6 +96,7 @@ def generate_plots(
         "#bcbd22",
         "#17becf",
     ],
+    use_cache=True,
 ):
     """
     Module conatining a function for plotting data from a selected excel file
@@ -95,457 +141,797 @@ def generate_plots(
         color_scheme[i] represents the color used in plotting the ith series , 
         by default [ "#000000", "#ff0000", "#1f77b4", "#ff7f0e", "#2ca02c", "#9467bd", "#8c564b",
             "#e377c2", "#7f7f7f", "#bcbd22", "#17becf", ]
-    """
-    # MATPLOTLIB CONSTANTS, CAN BE EDITED TO SUIT YOUR PREFERENCES
+    use_cache : bool, optional
+        whether to reuse the data extracted from the excel file by a previous run
+        if the file hasn't changed since, and skip figures that were already saved
+        from the same file with the same formatting, by default True
 
-    # Scatter plot markers
-    primary_face_color = "none" if not fill_primary_marker else None
-    secondary_face_color = "none" if fill_primary_marker else None
+    NOTE
+    Figures are plotted in parallel using multiprocessing, so on Windows
+    scripts calling this function must be guarded by `if __name__ == "__main__":`
+    """
 
     excel_file_path = get_file()  # select excel file to generate plots from
     if excel_file_path:
-        # load excel workbook
-        root_folder = get_path_to_file(excel_file_path)
-        workbook = load_workbook(excel_file_path, data_only=True)
-        sheetnames = workbook.sheetnames
         print(f"Excel file selected: {excel_file_path}")
+        with closing(load_workbook(excel_file_path, read_only=True)) as workbook:
+            sheetnames = workbook.sheetnames
 
+        # group the sheets to be plotted by the figure they are plotted on
+        # NOTE - for proper functionality, all excel sheets which are part of the same
+        # subplot figure must be side by side in the excel workbook
+        figures_sheetnames = []
+        subplot_sheetnames = None  # sheets of the current subplot figure
         for sheetname in sheetnames:
             if sheetname in plot_infos:
-                # load sheet, sheet formatting, and relevant sheet content
-                plot_info = plot_infos[sheetname]
-                sheet = workbook[sheetname]
-                row_count = sheet.max_row
-                col_count = sheet.max_column
-                series_count = 0
-                print(f"\tProcessing sheet: {sheetname}")
-
-                # locate all target column numbers based on headers
-                # NOTE - header constants are case-sensitive and must be entirely lower-case
-                series_name_col = None
-                x_col = y_col = None
-                y_pos_error_col = y_neg_error_col = None
-                x_pos_error_col = x_neg_error_col = None
-                for col_no in range(col_count):
-                    col_header = sheet[
-                        convert_to_excel_address(row_no=0, col_no=col_no)
-                    ].value
-                    if (
-                        col_header == constants.HEADER_HEADER
-                        and series_name_col is None
-                    ):
-                        series_name_col = col_no
-                    elif col_header == constants.X_HEADER and x_col is None:
-                        x_col = col_no
-                    elif col_header == constants.Y_HEADER and y_col is None:
-                        y_col = col_no
-                    elif col_header == constants.Y_ERROR_HEADER:
-                        y_pos_error_col = y_neg_error_col = col_no
-                    elif (
-                        col_header == constants.Y_POS_ERROR_HEADER
-                        and y_pos_error_col is None
-                    ):
-                        y_pos_error_col = col_no
-                    elif (
-                        col_header == constants.Y_NEG_ERROR_HEADER
-                        and y_neg_error_col is None
-                    ):
-                        y_neg_error_col = col_no
-                    elif col_header == constants.X_ERROR_HEADER:
-                        x_pos_error_col = x_neg_error_col = col_no
-                    elif (
-                        col_header == constants.X_POS_ERROR_HEADER
-                        and x_pos_error_col is None
-                    ):
-                        x_pos_error_col = col_no
-                    elif (
-                        col_header == constants.X_NEG_ERROR_HEADER
-                        and x_neg_error_col is None
-                    ):
-                        x_neg_error_col = col_no
-
-                    target_cols = (
-                        series_name_col,
-                        x_col,
-                        y_col,
-                        y_pos_error_col,
-                        y_neg_error_col,
-                        x_pos_error_col,
-                        x_neg_error_col,
-                    )
-                    if None not in target_cols:
-                        break
+                suplot_tuple = plot_infos[sheetname].suplot_tuple
+                if suplot_tuple is None:
+                    figures_sheetnames.append([sheetname])
+                elif suplot_tuple[2] == 1 or subplot_sheetnames is None:
+                    subplot_sheetnames = [sheetname]
+                    figures_sheetnames.append(subplot_sheetnames)
+                else:
+                    subplot_sheetnames.append(sheetname)
+
+        plot_style = {
+            "primary_marker": primary_marker,
+            "secondary_marker": secondary_marker,
+            "secondary_marker_2": secondary_marker_2,
+            "secondary_marker_3": secondary_marker_3,
+            "fill_primary_marker": fill_primary_marker,
+            "error_bar_cap_size": error_bar_cap_size,
+            "error_bar_marker": error_bar_marker,
+            "dashed_line_style": dashed_line_style,
+            "dashed_line_color": dashed_line_color,
+            "fit_line_style": fit_line_style,
+            "fit_line_color": fit_line_color,
+            "color_scheme": color_scheme,
+        }
+
+        # figures saved by a previous run are recorded in a manifest, keyed by the
+        # content of the file and the figure's formatting, so figures that haven't
+        # changed since are skipped. Changes to fit functions can't be detected,
+        # so figures with fit lines are always plotted. Excel files in the same
+        # folder can save figures to the same destination, so they share a manifest
+        root_folder = get_path_to_file(excel_file_path)
+        manifest_path = join(
+            root_folder, constants.CACHE_FOLDERNAME, constants.FIGURE_MANIFEST_FILENAME
+        )
+        manifest = load_figure_manifest(manifest_path)
+        # keys of the figures to be plotted (None if the figure can't be keyed)
+        figure_keys = {}
+        file_hash = None  # hash of the file, shared by the manifest and data cache
+        if use_cache:
+            file_hash = get_file_hash(excel_file_path, constants.CACHE_FORMAT_VERSION)
+            file_mtime = getmtime(excel_file_path)
+            # the cache folder is shared by all figures, so it's created once
+            # here rather than by each of the worker processes
+            create_folder_if_not_exists(get_path_to_file(manifest_path))
+
+        # each figure is independent, so they are plotted in parallel processes.
+        # The figures are sent to the processes by pickling their PlotInfos, so
+        # figures with PlotInfos that can't be pickled (e.g. fit lines defined with
+        # lambda functions) are plotted in this process instead
+        parallel_figures, local_figures = [], []
+        for figure_sheetnames in figures_sheetnames:
+            figure_plot_infos = {
+                sheetname: plot_infos[sheetname] for sheetname in figure_sheetnames
+            }
+            figure = (figure_sheetnames, figure_plot_infos)
+            save_destination = get_save_destination(
+                root_folder, figure_sheetnames[-1], plot_infos[figure_sheetnames[-1]]
+            )
+            if save_destination is not None:
+                figure_keys[save_destination] = None
+                # figures may share a save folder, so the folders are created here
+                # rather than by each of the worker processes
+                create_folder_if_not_exists(get_path_to_file(save_destination))
+            if (
+                use_cache
+                and save_destination is not None
+                and not any(
+                    plot_info.fit_lines for plot_info in figure_plot_infos.values()
+                )
+            ):
+                figure_formatting = [
+                    [getattr(plot_info, attribute) for attribute in plot_info.__slots__]
+                    for plot_info in figure_plot_infos.values()
+                ]
+                figure_key = hashlib.sha1(
+                    repr(
+                        (file_hash, figure_sheetnames, figure_formatting, plot_style)
+                    ).encode()
+                ).hexdigest()
+                if (
+                    manifest.get(save_destination) == figure_key
+                    and exists(save_destination)
+                    and getmtime(save_destination) >= file_mtime
+                ):
+                    print(f"\tSkipping unchanged figure: {save_destination}")
+                    continue
+                figure_keys[save_destination] = figure_key
+            try:
+                pickle.dumps(figure)
+                parallel_figures.append(figure)
+            except (pickle.PicklingError, AttributeError, TypeError):
+                local_figures.append(figure)
+        if len(parallel_figures) < 2:
+            # not worth starting a process for a single figure
+            local_figures.extend(parallel_figures)
+            parallel_figures = []
+
+        # the entries of the figures to be plotted are removed before plotting,
+        # so a run that is interrupted can't leave an entry matching a
+        # destination that has since been overwritten
+        removed_entries = [
+            manifest.pop(save_destination)
+            for save_destination in figure_keys
+            if save_destination in manifest
+        ]
+        if removed_entries:
+            save_figure_manifest(manifest_path, manifest)
+
+        # the data of all sheets to be plotted is loaded at once, so the workbook is
+        # opened (or its cache read) once rather than once per figure
+        sheets_plot_data = load_plot_data(
+            excel_file_path,
+            [
+                sheetname
+                for figure_sheetnames, _ in parallel_figures + local_figures
+                for sheetname in figure_sheetnames
+            ],
+            use_cache,
+            file_hash,
+        )
+
+        with ProcessPoolExecutor(
+            max(min(len(parallel_figures), cpu_count()), 1)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    plot_sheets,
+                    excel_file_path,
+                    figure_sheetnames,
+                    figure_plot_infos,
+                    {
+                        sheetname: sheets_plot_data[sheetname]
+                        for sheetname in figure_sheetnames
+                    },
+                    **plot_style,
+                )
+                for figure_sheetnames, figure_plot_infos in parallel_figures
+            ]
+            for figure_sheetnames, figure_plot_infos in local_figures:
+                plot_sheets(
+                    excel_file_path,
+                    figure_sheetnames,
+                    figure_plot_infos,
+                    sheets_plot_data,
+                    **plot_style,
+                )
+            for future in futures:
+                future.result()  # raise any errors from the worker processes
+
+        if any(figure_key is not None for figure_key in figure_keys.values()):
+            for save_destination, figure_key in figure_keys.items():
+                if figure_key is not None:
+                    manifest[save_destination] = figure_key
+            save_figure_manifest(manifest_path, manifest)
+
 
-                # load contents of target columns while keeping track of the
-                # x and y extrema of the data, as well as the number of data
-                # series to be plotted
-                plot_data = {}
-                min_y = max_y = None
-                min_x = max_x = None
-                for row_no in range(1, row_count):
-                    (
-                        series_name,
-                        x_val,
-                        y_val,
-                        y_pos_error,
-                        y_neg_error,
-                        x_pos_error,
-                        x_neg_error,
-                    ) = tuple(
-                        map(
-                            lambda col_no: get_cell_value(
-                                sheet,
-                                row_no,
-                                col_no,
-                                is_number=col_no is not None
-                                and series_name_col is not col_no,
-                            ),
-                            target_cols,
+def load_figure_manifest(manifest_path):
+    """
+    Function to load the manifest of figures saved by previous runs
+
+    Parameters
+    ----------
+    manifest_path : str
+        absolute path to the manifest file
+
+    Returns
+    -------
+    manifest : dict[str, str]
+        manifest[save destination] = key of the figure saved to the destination,
+        empty if the manifest doesn't exist or can't be read
+    """
+
+    try:
+        with open(manifest_path, "r") as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_figure_manifest(manifest_path, manifest):
+    """
+    Function to save the manifest of saved figures
+
+    Parameters
+    ----------
+    manifest_path : str
+        absolute path to the manifest file
+    manifest : dict[str, str]
+        manifest[save destination] = key of the figure saved to the destination
+    """
+
+    # the manifest is written to a temporary file which then replaces the old
+    # manifest, so an interrupted write can't leave a partial manifest
+    create_folder_if_not_exists(get_path_to_file(manifest_path))
+    temp_path = f"{manifest_path}.{getpid()}.tmp"
+    with open(temp_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+    replace(temp_path, manifest_path)
+
+
+def extract_plot_data(excel_file_path, sheetnames):
+    """
+    Function to extract the data of each series from sheets of an excel file
+
+    Parameters
+    ----------
+    excel_file_path : str
+        absolute path to the excel file
+    sheetnames : list[str]
+        sheets whose data is to be extracted
+
+    Returns
+    -------
+    sheets_plot_data : dict[str, tuple]
+        sheets_plot_data[sheetname] = (plot_data, series_count, extrema), where
+        plot_data[series name][header] = values of the series in the target column
+        with the header, series_count is the no. of primary series, and extrema is
+        (min_x, max_x, min_y, max_y) of the sheet's data (None if it has no data)
+    """
+
+    # load excel workbook in read-only mode so the sheets are streamed
+    # rather than loaded into memory all at once. The workbook is closed on exit
+    # to release the file handle that is kept open in read-only mode
+    sheets_plot_data = {}
+    with closing(
+        load_workbook(excel_file_path, data_only=True, read_only=True)
+    ) as workbook:
+        for sheetname in sheetnames:
+            sheet = workbook[sheetname]
+            sheet.reset_dimensions()  # some files misreport their dimensions
+            series_count = 0
+
+            # the sheet is read in a single pass over its rows, since random
+            # access to cells is slow in read-only mode
+            rows = sheet.iter_rows(values_only=True)
+            header_row = next(rows, ())
+
+            # locate all target column numbers based on headers
+            # NOTE - header constants are case-sensitive and must be entirely lower-case
+            target_cols = dict.fromkeys(TARGET_HEADERS)
+            for col_no, col_header in enumerate(header_row):
+                if col_header in COMBINED_ERROR_HEADERS:
+                    for target_header in COMBINED_ERROR_HEADERS[col_header]:
+                        target_cols[target_header] = col_no
+                elif col_header in target_cols and target_cols[col_header] is None:
+                    target_cols[col_header] = col_no
+            series_name_col = target_cols[constants.HEADER_HEADER]
+            target_cols = tuple(target_cols.values())
+
+            # load the remaining rows all at once and transpose them into columns,
+            # so the contents of the target columns can be converted with
+            # vectorized numpy calls rather than one cell at a time
+            rows = list(rows)
+            columns = list(zip_longest(*rows))
+            empty_column = (None,) * len(rows)
+            target_columns = [
+                columns[col_no]
+                if col_no is not None and col_no < len(columns)
+                else empty_column
+                for col_no in target_cols
+            ]
+
+            # values[i] = contents of the ith data column, with rows missing an
+            # x or y value removed and missing error values set to 0
+            values = np.array(
+                [
+                    parse_column_values(column_values, default_value=np.nan)
+                    for column_values in target_columns[1:]
+                ],
+                dtype=np.float64,
+            ).reshape(len(DATA_HEADERS), len(rows))
+            has_values = ~np.isnan(values[0]) & ~np.isnan(values[1])
+            values = values[:, has_values]
+            values[2:][np.isnan(values[2:])] = 0
+            if series_name_col is None:
+                series_names = np.full(values.shape[1], "blank", dtype=object)
+            else:
+                series_names = np.array(
+                    [
+                        "blank" if series_name is None else series_name
+                        for series_name in parse_column_values(
+                            target_columns[0], is_number=False
                         )
-                    )
-                    series_name = "blank" if series_name is None else series_name
-                    if None not in (x_val, y_val):
-                        min_y = min(min_y, y_val) if min_y is not None else y_val
-                        max_y = max(max_y, y_val) if max_y is not None else y_val
-                        min_x = min(min_x, x_val) if min_x is not None else x_val
-                        max_x = max(max_x, x_val) if max_x is not None else x_val
-                        series_data = plot_data.get(series_name, {})
-                        if (
-                            constants.INDEX_HEADER not in series_data
-                            and (
-                                not str(series_name).startswith(
-                                    constants.SECONDARY_SERIES_PREFIX
-                                )
-                            )
-                            and (
-                                not str(series_name).startswith(
-                                    constants.SECONDARY_2_SERIES_PREFIX
-                                )
-                            )
-                            and (
-                                not str(series_name).startswith(
-                                    constants.SECONDARY_3_SERIES_PREFIX
-                                )
-                            )
-                        ):
-                            series_data[constants.INDEX_HEADER] = series_count
-                            series_count += 1
-
-                        series_data[constants.X_HEADER] = series_data.get(
-                            constants.X_HEADER, []
-                        ) + [x_val]
-                        series_data[constants.Y_HEADER] = series_data.get(
-                            constants.Y_HEADER, []
-                        ) + [y_val]
-                        series_data[constants.Y_POS_ERROR_HEADER] = series_data.get(
-                            constants.Y_POS_ERROR_HEADER, []
-                        ) + [y_pos_error if y_pos_error is not None else 0]
-                        series_data[constants.Y_NEG_ERROR_HEADER] = series_data.get(
-                            constants.Y_NEG_ERROR_HEADER, []
-                        ) + [y_neg_error if y_neg_error is not None else 0]
-                        series_data[constants.X_POS_ERROR_HEADER] = series_data.get(
-                            constants.X_POS_ERROR_HEADER, []
-                        ) + [x_pos_error if x_pos_error is not None else 0]
-                        series_data[constants.X_NEG_ERROR_HEADER] = series_data.get(
-                            constants.X_NEG_ERROR_HEADER, []
-                        ) + [x_neg_error if x_neg_error is not None else 0]
-                        plot_data[series_name] = series_data
-
-                # create matplotlib figure or subplot (depending on PlotInfo formatting)
-                # NOTE - for proper functionality, all excel sheets which are part of the same
-                # subplot figure must be side by side in the excel workbook. The order they occur
-                # in the excel sheet are irrelevant (as long as they are side-by-side) since their
-                # order is defined in the PlotInfo list.
-                if plot_info.suplot_tuple is not None:
-                    (
-                        subplot_row_count,
-                        subplot_col_count,
-                        subplot_index,
-                    ) = plot_info.suplot_tuple
-                    if subplot_index == 1:
-                        plt.figure(sheetnames.index(sheetname), dpi=plot_info.dpi)
-                    plt.subplot(subplot_row_count, subplot_col_count, subplot_index)
+                    ],
+                    dtype=object,
+                )[has_values]
+
+            # x and y extrema of the data
+            min_x = max_x = min_y = max_y = None
+            if values.shape[1]:
+                min_x, min_y = np.nanmin(values[:2], axis=1).tolist()
+                max_x, max_y = np.nanmax(values[:2], axis=1).tolist()
+
+            # group the rows by series, in the order each series first occurs
+            unique_names, first_rows, row_series = np.unique(
+                series_names, return_index=True, return_inverse=True
+            )
+            series_rows = np.split(
+                np.argsort(row_series, kind="stable"),
+                np.cumsum(np.bincount(row_series, minlength=len(unique_names)))[:-1],
+            )
+            plot_data = {}
+            for series in np.argsort(first_rows).tolist():
+                series_name = unique_names[series]
+                # primary series are indexed in the order they occur, while
+                # secondary series are matched to their primary series when plotted
+                if series_name.startswith(SECONDARY_SERIES_PREFIXES):
+                    series_data = {constants.INDEX_HEADER: None}
                 else:
-                    plt.figure(sheetnames.index(sheetname), dpi=plot_info.dpi)
-
-                # sort all series names, pushing secondary series to the right end of
-                # the list
-                sorted_series_names = list(
-                    map(
-                        lambda key: [
-                            key,
-                            plot_data[key].get(constants.INDEX_HEADER, None),
-                        ],
-                        plot_data.keys(),
-                    )
+                    series_data = {constants.INDEX_HEADER: series_count}
+                    series_count += 1
+                series_values = values[:, series_rows[series]]
+                for header, header_values in zip(DATA_HEADERS, series_values):
+                    series_data[header] = header_values
+                plot_data[series_name] = series_data
+
+            sheets_plot_data[sheetname] = (
+                plot_data,
+                series_count,
+                (min_x, max_x, min_y, max_y),
+            )
+    return sheets_plot_data
+
+
+def load_plot_data(excel_file_path, sheetnames, use_cache=True, file_hash=None):
+    """
+    Function to load the data of each series from sheets of an excel file,
+    reusing the result of previous runs when the file is unchanged.
+
+    Parameters
+    ----------
+    excel_file_path : str
+        absolute path to the excel file
+    sheetnames : list[str]
+        sheets whose data is to be loaded
+    use_cache : bool, optional
+        whether to read/write the extracted data from/to a cache folder
+        next to the excel file, by default True
+    file_hash : str, optional
+        hash of the file's content and constants.CACHE_FORMAT_VERSION (see
+        get_file_hash), if it's already been computed, by default None
+
+    Returns
+    -------
+    sheets_plot_data : dict[str, tuple]
+        extracted data of each sheet (see extract_plot_data)
+    """
+
+    if not sheetnames:
+        return {}
+    if not use_cache:
+        return extract_plot_data(excel_file_path, sheetnames)
+
+    # the data of every sheet of the file is cached together, keyed by the content
+    # of the file, so sheets extracted by previous runs are shared by all figures
+    if file_hash is None:
+        file_hash = get_file_hash(excel_file_path, constants.CACHE_FORMAT_VERSION)
+    cache_path = get_cache_path(excel_file_path, extract_plot_data.__name__, file_hash)
+    sheets_plot_data = read_cache(cache_path) or {}
+    missing_sheetnames = [
+        sheetname for sheetname in sheetnames if sheetname not in sheets_plot_data
+    ]
+    if missing_sheetnames:
+        sheets_plot_data.update(extract_plot_data(excel_file_path, missing_sheetnames))
+        write_cache(cache_path, sheets_plot_data)
+    return {sheetname: sheets_plot_data[sheetname] for sheetname in sheetnames}
+
+
+def get_save_destination(root_folder, sheetname, plot_info):
+    """
+    Function to get the path a sheet's figure is saved to
+
+    Parameters
+    ----------
+    root_folder : str
+        folder containing the excel file being plotted
+    sheetname : str
+        name of the sheet
+    plot_info : PlotInfo
+        formatting information of the sheet
+
+    Returns
+    -------
+    save_destination : str or None
+        absolute path of the saved figure, or None if the figure is saved
+        along with a later sheet (i.e. the sheet is not the last subplot of its figure)
+    """
+
+    if (
+        plot_info.suplot_tuple is None
+        or (plot_info.suplot_tuple[0] * plot_info.suplot_tuple[1])
+        <= plot_info.suplot_tuple[2]
+    ):
+        return join(
+            root_folder,
+            plot_info.save_sub_directory,
+            sheetname + plot_info.save_file_extension,
+        )
+    return None
+
+
+def plot_sheets(
+    excel_file_path,
+    sheetnames,
+    plot_infos,
+    sheets_plot_data,
+    *,
+    primary_marker,
+    secondary_marker,
+    secondary_marker_2,
+    secondary_marker_3,
+    fill_primary_marker,
+    error_bar_cap_size,
+    error_bar_marker,
+    dashed_line_style,
+    dashed_line_color,
+    fit_line_style,
+    fit_line_color,
+    color_scheme,
+):
+    """
+    Function to plot the figure of one or more sheets of an excel file
+
+    Parameters
+    ----------
+    excel_file_path : str
+        absolute path to the excel file to generate plots from
+    sheetnames : list[str]
+        sheets to be plotted, in the order they occur in the excel file
+    plot_infos : dict[str, PlotInfo]
+        formatting information of each sheet that is to be plotted
+    sheets_plot_data : dict[str, tuple]
+        extracted data of each sheet that is to be plotted (see extract_plot_data)
+    primary_marker, ..., color_scheme
+        formatting options of the figures (see generate_plots)
+    """
+    # MATPLOTLIB CONSTANTS, CAN BE EDITED TO SUIT YOUR PREFERENCES
+
+    # Scatter plot markers
+    primary_face_color = "none" if not fill_primary_marker else None
+    secondary_face_color = "none" if fill_primary_marker else None
+    # (series name prefix, marker, face color) of each kind of secondary series
+    secondary_series_styles = (
+        (constants.SECONDARY_SERIES_PREFIX, secondary_marker, secondary_face_color),
+        (constants.SECONDARY_2_SERIES_PREFIX, secondary_marker_2, primary_face_color),
+        (constants.SECONDARY_3_SERIES_PREFIX, secondary_marker_3, secondary_face_color),
+    )
+
+    # matplotlib is slow to import, so it's only imported when figures are plotted.
+    # Figures are drawn with the object-oriented API on the Agg canvas, so
+    # pyplot's global figure state isn't used
+    from matplotlib.colors import to_rgba_array
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    root_folder = get_path_to_file(excel_file_path)
+    fig = None  # figure of the current sheet
+    for sheetname in sheetnames:
+        plot_info = plot_infos[sheetname]
+        plot_data, series_count, extrema = sheets_plot_data[sheetname]
+        min_x, max_x, min_y, max_y = extrema
+        print(f"\tProcessing sheet: {sheetname}")
+
+        # create matplotlib figure or subplot (depending on PlotInfo formatting)
+        # NOTE - for proper functionality, all excel sheets which are part of the same
+        # subplot figure must be side by side in the excel workbook. The order they occur
+        # in the excel sheet are irrelevant (as long as they are side-by-side) since their
+        # order is defined in the PlotInfo list.
+        if plot_info.suplot_tuple is not None:
+            (
+                subplot_row_count,
+                subplot_col_count,
+                subplot_index,
+            ) = plot_info.suplot_tuple
+            if subplot_index == 1 or fig is None:
+                fig = Figure(dpi=plot_info.dpi)
+                FigureCanvasAgg(fig)
+            ax = fig.add_subplot(subplot_row_count, subplot_col_count, subplot_index)
+        else:
+            fig = Figure(dpi=plot_info.dpi)
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+
+        # sort all series names, pushing secondary series to the right end of
+        # the list
+        sorted_series_names = [
+            (series_name, series_data.get(constants.INDEX_HEADER))
+            for series_name, series_data in plot_data.items()
+        ]
+        sorted_series_names.sort(key=lambda x: (x[1] is None, x[1] or 0))
+        if plot_info.reverse_series:
+            sorted_series_names.reverse()
+
+        # index of each primary series, used to match secondary series
+        # to the primary series they belong to
+        series_idx_by_name = {
+            name: idx for name, idx in sorted_series_names if idx is not None
+        }
+
+        # PLOT FIGURE AND IMPLEMENT SPECIFIED FORMATTING
+        # scatter points and error bars of series with the same style, which
+        # are drawn with one call per style rather than one call per series
+        scatter_groups = {}
+        error_bar_groups = {}
+        # colors of the series as RGBA tuples, which are parsed once per sheet
+        # rather than by each artist the colors are used in
+        palette = [
+            tuple(rgba)
+            for rgba in to_rgba_array(plot_info.color_map or color_scheme).tolist()
+        ]
+        # scratch buffer used to sort the values of each series
+        sort_buffer = np.empty(
+            max((len(data[constants.X_HEADER]) for data in plot_data.values()), default=0)
+        )
+        for series_name, series_idx in sorted_series_names:
+            # if current series is a secondary series, remove legend
+            # and provide same color scheme as original series
+            is_secondary_series = series_idx is None
+            true_idx = series_idx
+            legend = (
+                "_nolegend_"
+                if is_secondary_series or not plot_info.legends
+                else plot_info.legends[true_idx]
+            )
+            if is_secondary_series:
+                series_name_str = str(series_name)
+                for prefix, marker, face_color in secondary_series_styles:
+                    if series_name_str.startswith(prefix):
+                        break
+                true_idx = series_idx_by_name.get(series_name_str[len(prefix) :])
+                if true_idx is None:
+                    true_idx = series_count
+                    series_count += 1
+            else:
+                marker, face_color = primary_marker, primary_face_color
+            series_color = palette[true_idx]
+
+            # error bar values
+            y_pos_errors, y_neg_errors = (
+                plot_data[series_name][constants.Y_POS_ERROR_HEADER],
+                plot_data[series_name][constants.Y_NEG_ERROR_HEADER],
+            )
+            x_pos_errors, x_neg_errors = (
+                plot_data[series_name][constants.X_POS_ERROR_HEADER],
+                plot_data[series_name][constants.X_NEG_ERROR_HEADER],
+            )
+            has_y_error = bool(y_pos_errors.any() or y_neg_errors.any())
+            has_x_error = bool(x_pos_errors.any() or x_neg_errors.any())
+
+            # plot scatter/line plot (based on PlotInfo) with error bars
+            if plot_info.plot_type == PlotType.SCATTER:
+                x, y = (
+                    plot_data[series_name][constants.X_HEADER],
+                    plot_data[series_name][constants.Y_HEADER],
                 )
-                sorted_series_names.sort(key=lambda x: (x[1] is None, x[1]))
-                if plot_info.reverse_series:
-                    sorted_series_names.reverse()
-
-                # PLOT FIGURE AND IMPLEMENT SPECIFIED FORMATTING
-                for series_name, series_idx in sorted_series_names:
-                    # if current series is a secondary series, remove legend
-                    # and provide same color scheme as original series
-                    is_secondary_series = series_idx is None
-                    secondary_idx = (
-                        0
-                        if not is_secondary_series
-                        else 1
-                        if (
-                            str(series_name).startswith(
-                                constants.SECONDARY_SERIES_PREFIX
-                            )
-                        )
-                        else 2
-                        if (
-                            str(series_name).startswith(
-                                constants.SECONDARY_2_SERIES_PREFIX
-                            )
+                x = x + (
+                    true_idx * plot_info.secondary_series_stagger
+                )  # secondary data points can be shifted horizontally
+                # by a set offset for clarity
+
+                # the series is drawn later along with all series that
+                # share its style
+                scatter_x, scatter_y = scatter_groups.setdefault(
+                    (series_color, marker, face_color, legend), ([], [])
+                )
+                scatter_x.append(x)
+                scatter_y.append(y)
+
+                if has_y_error or has_x_error:
+                    error_x, error_y, y_errors, x_errors = (
+                        error_bar_groups.setdefault(
+                            (series_color, has_y_error, has_x_error),
+                            ([], [], [], []),
                         )
-                        else 3
                     )
+                    error_x.append(x)
+                    error_y.append(y)
+                    y_errors.append(np.stack((y_neg_errors, y_pos_errors)))
+                    x_errors.append(np.stack((x_neg_errors, x_pos_errors)))
+            elif plot_info.plot_type == PlotType.LINE:
+                x, y = (
+                    plot_data[series_name][constants.X_HEADER],
+                    plot_data[series_name][constants.Y_HEADER],
+                )
+                if plot_info.sort_data and (x[1:] < x[:-1]).any():
+                    # sort the series values in place through the scratch
+                    # buffer, rather than allocating new sorted arrays. Series
+                    # already in ascending order of x are left as they are
+                    sorting = np.argsort(x, kind="stable")
+                    series_sort_buffer = sort_buffer[: len(x)]
+                    for series_values in (
+                        x,
+                        y,
+                        y_pos_errors,
+                        y_neg_errors,
+                        x_pos_errors,
+                        x_neg_errors,
+                    ):
+                        np.take(series_values, sorting, out=series_sort_buffer)
+                        series_values[:] = series_sort_buffer
 
-                    true_idx = series_idx
-                    legend = (
-                        "_nolegend_"
-                        if is_secondary_series or not plot_info.legends
-                        else plot_info.legends[true_idx]
-                    )
-                    if is_secondary_series:
-                        true_name = series_name
-                        for sec_keyword in (
-                            constants.SECONDARY_SERIES_PREFIX,
-                            constants.SECONDARY_2_SERIES_PREFIX,
-                            constants.SECONDARY_3_SERIES_PREFIX,
-                        ):
-                            if true_name.startswith(sec_keyword):
-                                true_name = true_name[len(sec_keyword) :]
-                                break
-                        for sub_series_name, sub_idx in sorted_series_names:
-                            if sub_series_name == true_name:
-                                true_idx = sub_idx
-                                break
-                        if true_idx is None:
-                            true_idx = series_count
-                            series_count += 1
-                    series_color = (
-                        plot_info.color_map[true_idx]
-                        if plot_info.color_map
-                        else color_scheme[true_idx]
-                    )
+                ax.plot(x, y, color=series_color, label=legend)
 
-                    # error bar values
-                    y_pos_errors, y_neg_errors = (
-                        plot_data[series_name][constants.Y_POS_ERROR_HEADER],
-                        plot_data[series_name][constants.Y_NEG_ERROR_HEADER],
+                if has_y_error:
+                    ax.fill_between(
+                        x,
+                        y - y_neg_errors,
+                        y + y_pos_errors,
+                        color=series_color,
+                        alpha=0.25,
+                        label="_nolegend_",
                     )
-                    x_pos_errors, x_neg_errors = (
-                        plot_data[series_name][constants.X_POS_ERROR_HEADER],
-                        plot_data[series_name][constants.X_NEG_ERROR_HEADER],
+                if has_x_error:
+                    ax.fill_between(
+                        y,
+                        x - x_neg_errors,
+                        x + x_pos_errors,
+                        color=series_color,
+                        alpha=0.25,
+                        label="_nolegend_",
                     )
-                    has_y_error = max(*y_pos_errors, *y_neg_errors) != 0
-                    has_x_error = max(*x_pos_errors, *x_neg_errors) != 0
-
-                    # plot scatter/line plot (based on PlotInfo) with error bars
-                    if plot_info.plot_type == PlotType.SCATTER:
-                        x, y = (
-                            plot_data[series_name][constants.X_HEADER],
-                            plot_data[series_name][constants.Y_HEADER],
-                        )
-                        x = np.array(x) + (
-                            true_idx * plot_info.secondary_series_stagger
-                        )  # secondary data points can be shifted horizontally
-                        # by a set offset for clarity
-
-                        marker = (
-                            primary_marker
-                            if not is_secondary_series
-                            else secondary_marker
-                            if secondary_idx == 1
-                            else secondary_marker_2
-                            if secondary_idx == 2
-                            else secondary_marker_3
-                        )
-                        face_color = (
-                            primary_face_color
-                            if (not is_secondary_series)
-                            else secondary_face_color
-                            if (secondary_idx == 1)
-                            else primary_face_color
-                            if secondary_idx == 2
-                            else secondary_face_color
-                        )
-                        plt.scatter(
-                            x,
-                            y,
-                            color=series_color,
-                            facecolors=face_color,
-                            marker=marker,
-                            label=legend,
-                            s=plot_info.marker_size,
-                        )
 
-                        if has_y_error or has_x_error:
-                            y_error = (
-                                np.array(list(zip(y_neg_errors, y_pos_errors))).T
-                                if has_y_error
-                                else None
-                            )
-                            x_error = (
-                                np.array(list(zip(x_neg_errors, x_pos_errors))).T
-                                if has_x_error
-                                else None
-                            )
-                            plt.errorbar(
-                                x,
-                                y,
-                                yerr=y_error,
-                                xerr=x_error,
-                                fmt=error_bar_marker,
-                                error_bar_cap_size=error_bar_cap_size,
-                                ecolor=series_color,
-                                label="_nolegend_",
-                            )
-                    elif plot_info.plot_type == PlotType.LINE:
-                        x, y = (
-                            plot_data[series_name][constants.X_HEADER],
-                            plot_data[series_name][constants.Y_HEADER],
+            if plot_info.draw_line_at_maximum:
+                # draw a vertical line that passes through the
+                # maximum y-value of the series
+                if len(x) > 0:
+                    y_min, y_max = np.min(y), np.max(y)
+                    x_max = x[np.nanargmax(y)]
+                    if plot_info.draw_line_at_maximum:
+                        ax.vlines(
+                            x_max,
+                            min(0, y_min),
+                            max(0, y_max),
+                            linestyles="dashed",
+                            label="_nolegend_",
                         )
-                        if plot_info.sort_data:
-                            x = np.array(x)
-                            y = np.array(y)
-                            sorting = np.argsort(x)
-                            x = x[sorting]
-                            y = y[sorting]
-
-                        plt.plot(x, y, color=series_color, label=legend)
-
-                        if has_y_error:
-                            plt.fill_between(
-                                x,
-                                np.array(y) - np.array(y_neg_errors),
-                                np.array(y) + np.array(y_pos_errors),
-                                color=series_color,
-                                alpha=0.25,
-                                label="_nolegend_",
-                            )
-                        if has_x_error:
-                            plt.fill_between(
-                                y,
-                                np.array(x) - np.array(x_neg_errors),
-                                np.array(x) + np.array(x_pos_errors),
-                                color=series_color,
-                                alpha=0.25,
-                                label="_nolegend_",
-                            )
 
-                    if plot_info.draw_line_at_maximum:
-                        # draw a vertical line that passes through the
-                        # maximum y-value of the series
-                        if len(x) > 0:
-                            y_min, y_max = np.min(y), np.max(y)
-                            x_max = x[np.nanargmax(y)]
-                            if plot_info.draw_line_at_maximum:
-                                plt.vlines(
-                                    x_max,
-                                    min(0, y_min),
-                                    max(0, y_max),
-                                    linestyles="dashed",
-                                    label="_nolegend_",
-                                )
-
-                for i, fit_line in enumerate(plot_info.fit_lines):
-                    # draw lines on the figure defined by y = fit_function(x)
-                    # with a domain of [fit_start_x, fit_end_x]
-                    fit_start_x, fit_end_x, fit_function = fit_line
-                    fit_x = np.linspace(fit_start_x, fit_end_x)
-                    fit_y = list(map(fit_function, fit_x))
-                    plt.plot(
-                        fit_x,
-                        fit_y,
-                        color=fit_line_color
-                        if not plot_info.use_color_map_for_fit_color
-                        else color_scheme[i],
-                        linestyle=fit_line_style,
-                    )
+        # dense scatter plots are rasterized, so vector file formats (e.g. .eps)
+        # store them as an image rather than as an object per point
+        rasterize_points = (
+            sum(
+                len(x_values)
+                for scatter_x, _ in scatter_groups.values()
+                for x_values in scatter_x
+            )
+            > RASTERIZE_POINT_COUNT
+        )
+        for (
+            series_color,
+            marker,
+            face_color,
+            legend,
+        ), (scatter_x, scatter_y) in scatter_groups.items():
+            ax.scatter(
+                np.concatenate(scatter_x),
+                np.concatenate(scatter_y),
+                color=series_color,
+                facecolors=face_color,
+                marker=marker,
+                label=legend,
+                s=plot_info.marker_size,
+                rasterized=rasterize_points,
+            )
+        for (
+            series_color,
+            has_y_error,
+            has_x_error,
+        ), (error_x, error_y, y_errors, x_errors) in error_bar_groups.items():
+            error_bars = ax.errorbar(
+                np.concatenate(error_x),
+                np.concatenate(error_y),
+                yerr=np.concatenate(y_errors, axis=1) if has_y_error else None,
+                xerr=np.concatenate(x_errors, axis=1) if has_x_error else None,
+                fmt=error_bar_marker,
+                capsize=error_bar_cap_size,
+                ecolor=series_color,
+                label="_nolegend_",
+            )
+            if rasterize_points:
+                for error_bar_artist in error_bars.get_children():
+                    error_bar_artist.set_rasterized(True)
 
-                if plot_info.legends:
-                    # include series legends based on specified formatting
-                    if plot_info.reverse_legends:
-                        handles, labels = plt.gca().get_legend_handles_labels()
-                        plt.gca().legend(
-                            handles[::-1],
-                            labels[::-1],
-                            fontsize=plot_info.legend_size,
-                            loc=plot_info.legend_loc,
-                            ncol=plot_info.legend_n_cols,
-                            bbox_to_anchor=plot_info.legend_bbox_anchor,
-                        )
-                    else:
-                        plt.legend(
-                            fontsize=plot_info.legend_size,
-                            loc=plot_info.legend_loc,
-                            ncol=plot_info.legend_n_cols,
-                            bbox_to_anchor=plot_info.legend_bbox_anchor,
-                        )
+        for i, fit_line in enumerate(plot_info.fit_lines):
+            # draw lines on the figure defined by y = fit_function(x)
+            # with a domain of [fit_start_x, fit_end_x]
+            fit_start_x, fit_end_x, fit_function = fit_line
+            fit_x = np.linspace(fit_start_x, fit_end_x, FIT_LINE_SAMPLE_COUNT)
+            try:
+                # evaluate the fit function on all x-values at once, which works
+                # for functions built from numpy-compatible operations
+                fit_y = np.broadcast_to(
+                    np.asarray(fit_function(fit_x), dtype=np.float64), fit_x.shape
+                )
+            except (TypeError, ValueError):
+                # otherwise evaluate the fit function for one x-value at a time
+                fit_y = np.fromiter(
+                    map(fit_function, fit_x), dtype=np.float64, count=fit_x.size
+                )
+            ax.plot(
+                fit_x,
+                fit_y,
+                color=fit_line_color
+                if not plot_info.use_color_map_for_fit_color
+                else color_scheme[i],
+                linestyle=fit_line_style,
+            )
 
-                if plot_info.vline_at_x is not None:
-                    # draw vertical line that passes through a specified x-value
-                    plt.vlines(
-                        plot_info.vline_at_x,
-                        0 if np.sign(min_y) == np.sign(max_y) else min_y,
-                        max_y if max_y > 0 else min_y,
-                        linestyles=dashed_line_style,
-                        color_scheme=dashed_line_color,
-                        label="_nolegend_",
-                    )
-                if plot_info.hline_at_y is not None:
-                    # draw horizontal line that passes through a specified y-value
-                    plt.hlines(
-                        plot_info.hline_at_y,
-                        0 if np.sign(min_x) == np.sign(max_x) else min_x,
-                        max_x + (series_count * plot_info.secondary_series_stagger)
-                        if max_x > 0
-                        else min_x,
-                        linestyles=dashed_line_style,
-                        color_scheme=dashed_line_color,
-                        label="_nolegend_",
-                    )
+        if plot_info.legends:
+            # include series legends based on specified formatting
+            handles, labels = ax.get_legend_handles_labels()
+            if plot_info.reverse_legends:
+                handles.reverse()
+                labels.reverse()
+            ax.legend(
+                handles,
+                labels,
+                fontsize=plot_info.legend_size,
+                loc=plot_info.legend_loc,
+                ncol=plot_info.legend_n_cols,
+                bbox_to_anchor=plot_info.legend_bbox_anchor,
+            )
 
-                # convert axes to logarithm scale based on specified formatting
-                if plot_info.yaxis_log_scale:
-                    plt.yscale("log", base=10)
-                if plot_info.xaxis_log_scale:
-                    plt.xscale("log", base=10)
-
-                # additional figure formatting
-                plt.ylim(plot_info.ylim)
-                plt.xlim(plot_info.xlim)
-                plt.title(plot_info.title, loc="left")
-                plt.xlabel(plot_info.xlabel, fontsize=plot_info.font_size)
-                plt.ylabel(plot_info.ylabel, fontsize=plot_info.font_size)
-                plt.xticks(fontsize=plot_info.font_size)
-                plt.yticks(fontsize=plot_info.font_size)
-                plt.gca().tick_params(axis="both", which="both", direction="in")
-                if not plot_info.show_x_axis_numbers:
-                    plt.gca().axes.xaxis.set_ticklabels([])
-                if not plot_info.show_y_axis_numbers:
-                    plt.gca().axes.yaxis.set_ticklabels([])
-                if plot_info.figure_size_in_inches:
-                    plt.gcf().set_size_inches(*plot_info.figure_size_in_inches)
-
-                # save figure using specified file extension
-                if (
-                    plot_info.suplot_tuple is None
-                    or (plot_info.suplot_tuple[0] * plot_info.suplot_tuple[1])
-                    <= plot_info.suplot_tuple[2]
-                ):
-                    save_folder = create_folder_if_not_exists(
-                        join(root_folder, plot_info.save_sub_directory)
-                    )
-                    save_destination = join(
-                        save_folder, sheetname + plot_info.save_file_extension
-                    )
-                    plt.savefig(save_destination)
-                    plt.close()
+        if plot_info.vline_at_x is not None:
+            # draw vertical line that passes through a specified x-value
+            ax.vlines(
+                plot_info.vline_at_x,
+                0 if np.sign(min_y) == np.sign(max_y) else min_y,
+                max_y if max_y > 0 else min_y,
+                linestyles=dashed_line_style,
+                color=dashed_line_color,
+                label="_nolegend_",
+            )
+        if plot_info.hline_at_y is not None:
+            # draw horizontal line that passes through a specified y-value
+            ax.hlines(
+                plot_info.hline_at_y,
+                0 if np.sign(min_x) == np.sign(max_x) else min_x,
+                max_x + (series_count * plot_info.secondary_series_stagger)
+                if max_x > 0
+                else min_x,
+                linestyles=dashed_line_style,
+                color=dashed_line_color,
+                label="_nolegend_",
+            )
+
+        # convert axes to logarithm scale based on specified formatting
+        if plot_info.yaxis_log_scale:
+            ax.set_yscale("log", base=10)
+        if plot_info.xaxis_log_scale:
+            ax.set_xscale("log", base=10)
+
+        # additional figure formatting
+        ax.set_ylim(plot_info.ylim)
+        ax.set_xlim(plot_info.xlim)
+        ax.set_title(plot_info.title, loc="left")
+        ax.set_xlabel(plot_info.xlabel, fontsize=plot_info.font_size)
+        ax.set_ylabel(plot_info.ylabel, fontsize=plot_info.font_size)
+        for tick_label in ax.get_xticklabels() + ax.get_yticklabels():
+            tick_label.set_fontsize(plot_info.font_size)
+        ax.tick_params(axis="both", which="both", direction="in")
+        if not plot_info.show_x_axis_numbers:
+            ax.xaxis.set_ticklabels([])
+        if not plot_info.show_y_axis_numbers:
+            ax.yaxis.set_ticklabels([])
+        if plot_info.figure_size_in_inches:
+            fig.set_size_inches(*plot_info.figure_size_in_inches)
+
+        # save figure using specified file extension
+        save_destination = get_save_destination(root_folder, sheetname, plot_info)
+        if save_destination is not None:
+            create_folder_if_not_exists(get_path_to_file(save_destination))
+            fig.savefig(save_destination)
@@ -3,12 +3,16 @@
     used to store figure formatting information used in
     plotting matplotlib figures in plotter.py
 """
+import copy
 from enum import Enum
 import data_processing_toolkit.constants as constants
 
 
-class PlotType(Enum):
-    """Enum describing the type of matplotlib plot used in representing data"""
+class PlotType(str, Enum):
+    """
+    Enum describing the type of matplotlib plot used in representing data.
+    Members are also strings, so they compare equal to their values (e.g. "scatter").
+    """
 
     SCATTER = "scatter"
     LINE = "line"
@@ -66,6 +70,7 @@ class PlotInfo:
     fit_lines : tuple
         (x start, x end, function: lambda) used to draw a fit curve on the plot.
         The function should be a lambda function with one parameter (y = function(x)).
+        Functions that also accept numpy arrays are evaluated on all x-values at once.
     sort_data : bool
         Series will be plotted based on x-values if True.
     show_x_axis_numbers : bool
@@ -101,14 +106,51 @@ class PlotInfo:
     order is defined in the PlotInfo list.
     '''
 
+    # attributes are stored in slots rather than a per-instance __dict__
+    __slots__ = (
+        "plot_type",
+        "xlabel",
+        "ylabel",
+        "save_sub_directory",
+        "secondary_series_stagger",
+        "legends",
+        "vline_at_x",
+        "hline_at_y",
+        "ylim",
+        "xlim",
+        "yaxis_log_scale",
+        "xaxis_log_scale",
+        "save_file_extension",
+        "reverse_legends",
+        "font_size",
+        "_legend_size",
+        "figure_size_in_inches",
+        "suplot_tuple",
+        "title",
+        "fit_lines",
+        "sort_data",
+        "show_x_axis_numbers",
+        "show_y_axis_numbers",
+        "reverse_series",
+        "legend_loc",
+        "legend_n_cols",
+        "legend_bbox_anchor",
+        "draw_line_at_maximum",
+        "color_map",
+        "marker_size",
+        "use_color_map_for_fit_color",
+        "dpi",
+    )
+
     def __init__(
         self,
         plot_type,
         xlabel,
         ylabel,
         save_sub_directory,
+        *,
         secondary_series_stagger=0,
-        legends=[],
+        legends=(),
         vline_at_x=None,
         hline_at_y=None,
         ylim=(None, None),
@@ -122,7 +164,7 @@ class PlotInfo:
         figure_size_in_inches=None,
         suplot_tuple=None,
         title=None,
-        fit_lines=[],
+        fit_lines=(),
         sort_data=False,
         show_x_axis_numbers=True,
         show_y_axis_numbers=True,
@@ -151,7 +193,7 @@ class PlotInfo:
         self.save_file_extension = save_file_extension
         self.reverse_legends = reverse_legends
         self.font_size = font_size
-        self.legend_size = legend_size if legend_size is not None else font_size
+        self.legend_size = legend_size
         self.figure_size_in_inches = figure_size_in_inches
         self.suplot_tuple = suplot_tuple
         self.title = title
@@ -168,3 +210,33 @@ class PlotInfo:
         self.marker_size = marker_size
         self.use_color_map_for_fit_color = use_color_map_for_fit_color
         self.dpi = dpi
+
+    def derive(self, **overrides):
+        """
+        Function to create a copy of this PlotInfo with some of its formatting changed,
+        e.g. for figures that share most of their formatting
+
+        Parameters
+        ----------
+        **overrides : any
+            new values of attributes of the copy (see PlotInfo parameters)
+
+        Returns
+        -------
+        plot_info : PlotInfo
+            shallow copy of this PlotInfo with the overridden attributes
+        """
+
+        plot_info = copy.copy(self)
+        for attribute, value in overrides.items():
+            setattr(plot_info, attribute, value)
+        return plot_info
+
+    @property
+    def legend_size(self):
+        """Font size of legend text, which is the font size if one isn't provided"""
+        return self._legend_size if self._legend_size is not None else self.font_size
+
+    @legend_size.setter
+    def legend_size(self, legend_size):
+        self._legend_size = legend_size